@@ -3,19 +3,22 @@ import select
 import sys
 import time
 
-from .models.client import Client
+from .models.client import Client, ConnectionClosedError
 from .utils.contextmanagers import Timer
 
 if __name__ == "__main__":
-    if len(sys.argv) != 5:
-        print("Usage: python -m client <SERVER_IP> <PORT> <USERNAME> <PASSWORD>")
+    ROTATE_KEY = "--rotate-key" in sys.argv[1:]
+    ARGS = [arg for arg in sys.argv if arg != "--rotate-key"]
+
+    if len(ARGS) != 5:
+        print("Usage: python -m client <SERVER_IP> <PORT> <USERNAME> <PASSWORD> [--rotate-key]")
         sys.exit(1)
 
-    _, SERVER_IP, PORT, USERNAME, PASSWORD = sys.argv
+    _, SERVER_IP, PORT, USERNAME, PASSWORD = ARGS
     PORT = int(PORT)
 
     # Initialize the client object
-    client = Client((SERVER_IP, PORT), USERNAME)
+    client = Client((SERVER_IP, PORT), USERNAME, rotate_key=ROTATE_KEY)
 
     # Connect and initialize
     client.connect()
@@ -42,13 +45,16 @@ if __name__ == "__main__":
         for run_sock in ready_to_read:
             if run_sock == client.socket:
                 try:
-                    username, message = client.receive_message()
-
-                    print()
-                    client.logger.message(username, message)
-                    client.logger.message("ME", "", end="")
+                    for username, message in client.receive_messages():
+                        print()
+                        client.logger.message(username, message)
+                        client.logger.message("ME", "", end="")
 
                     sys.stdout.flush()
+                except ConnectionClosedError as exc:
+                    print()
+                    client.logger.error(str(exc))
+                    sys.exit(1)
                 except IOError as e:
                     if e.errno != errno.EAGAIN and e.errno != errno.EWOULDBLOCK:
                         client.logger.error(f"Error occured while reading: {str(e)}")
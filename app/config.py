@@ -1,20 +1,27 @@
+import os
+import sys
 from textwrap import dedent
 
-from .utils import config_parser, get_bright_color
+from .utils import config_parser
 
 # Constants.
-BANNER = dedent(f"""{get_bright_color("CYAN")}
+BANNER = dedent("""
  ____               _____
 /_  / ___ _______  / ___/__  __ _
  / /_/ -_) __/ _ \\/ /__/ _ \\/  ' \\
 /___/\\__/_/  \\___/\\___/\\___/_/_/_/
 """)
 
+# Console config, headless processes skip the banner and screen clearing and log plain text.
+HEADLESS = config_parser("console", "HEADLESS").lower()
+HEADLESS = not sys.stdout.isatty() if HEADLESS == "auto" else config_parser("console", "HEADLESS", cast=bool)
+
 # Server related config.
 IP = config_parser("server", "IP")
 PORT = config_parser("server", "port", cast=int)
 HEADER_LENGTH = config_parser("server", "HEADER_LEN", cast=int)
 MOTD = config_parser("server", "MOTD")
+DEFAULT_CHANNEL = config_parser("server", "DEFAULT_CHANNEL")
 
 # Authentication config.
 PASSWORD = config_parser("auth", "PASSWORD")
@@ -22,3 +29,72 @@ PASSWORD = config_parser("auth", "PASSWORD")
 # Max connections.
 MAX_CONNECTIONS = config_parser("server", "MAX_CONNECTIONS")
 MAX_CONNECTIONS = None if MAX_CONNECTIONS == "" else MAX_CONNECTIONS
+
+# Handshakes, seconds a new connection gets to complete it and how many may be in progress at once.
+HANDSHAKE_TIMEOUT = config_parser("server", "HANDSHAKE_TIMEOUT", cast=float)
+MAX_PENDING_HANDSHAKES = config_parser("server", "MAX_PENDING_HANDSHAKES", cast=int)
+
+# Heartbeats, seconds of silence before a client is pinged and before it is disconnected.
+PING_INTERVAL = config_parser("heartbeat", "PING_INTERVAL", cast=float)
+IDLE_TIMEOUT = config_parser("heartbeat", "IDLE_TIMEOUT", cast=float)
+
+# Worker processes.
+SERVER_WORKERS = config_parser("server", "WORKERS", cast=int)
+
+# Admin endpoint, bound to localhost. Workers use consecutive ports.
+ADMIN_PORT = config_parser("admin", "PORT")
+ADMIN_PORT = None if ADMIN_PORT == "" else int(ADMIN_PORT)
+
+# Protocol config.
+FRAMING = config_parser("protocol", "FRAMING").lower()
+SESSION_MAC = config_parser("protocol", "SESSION_MAC", cast=bool)
+COMPRESSION = config_parser("protocol", "COMPRESSION", cast=bool)
+COMPRESSION_THRESHOLD = config_parser("protocol", "COMPRESSION_THRESHOLD", cast=int)
+
+# Session resumption, cached sessions per worker and seconds a token stays valid after disconnecting.
+RESUME_CACHE_SIZE = config_parser("resumption", "CACHE_SIZE", cast=int)
+RESUME_TTL = config_parser("resumption", "TTL", cast=float)
+
+# Signature verification config.
+VERIFY_WORKERS = config_parser("verification", "WORKERS")
+VERIFY_WORKERS = (os.cpu_count() or 1) if VERIFY_WORKERS == "" else int(VERIFY_WORKERS)
+
+# Outbound queue config.
+SEND_HIGH_WATERMARK = config_parser("outbound", "HIGH_WATERMARK", cast=int)
+SEND_LOW_WATERMARK = config_parser("outbound", "LOW_WATERMARK", cast=int)
+SLOW_CONSUMER_POLICY = config_parser("outbound", "SLOW_CONSUMER_POLICY").lower()
+COALESCE_WINDOW = config_parser("outbound", "COALESCE_WINDOW", cast=float) / 1000
+COALESCE_BYTES = config_parser("outbound", "COALESCE_BYTES", cast=int)
+TCP_NODELAY = config_parser("outbound", "TCP_NODELAY", cast=bool)
+
+# Server logging config.
+LOG_LEVEL = config_parser("logging", "LEVEL").lower()
+LOG_FORMAT = config_parser("logging", "FORMAT").lower()
+LOG_FORMAT = "plain" if HEADLESS and LOG_FORMAT == "ansi" else LOG_FORMAT
+LOG_FILE = config_parser("logging", "FILE")
+LOG_QUEUE_SIZE = config_parser("logging", "QUEUE_SIZE", cast=int)
+LOG_OVERFLOW_POLICY = config_parser("logging", "OVERFLOW_POLICY").lower()
+LOG_SAMPLE_RATE = config_parser("logging", "SAMPLE_RATE", cast=int)
+
+# Message history config.
+HISTORY_DIRECTORY = config_parser("history", "DIRECTORY")
+HISTORY_SEGMENT_SIZE = config_parser("history", "SEGMENT_SIZE", cast=int)
+HISTORY_MAX_SEGMENTS = config_parser("history", "MAX_SEGMENTS", cast=int)
+HISTORY_INDEX_LIMIT = config_parser("history", "INDEX_LIMIT", cast=int)
+HISTORY_REPLAY = config_parser("history", "REPLAY", cast=int)
+
+# Traffic capture config.
+CAPTURE_DIRECTORY = config_parser("capture", "DIRECTORY")
+CAPTURE_MAX_SIZE = config_parser("capture", "MAX_SIZE", cast=int)
+
+# Profiler config.
+PROFILE_DIRECTORY = config_parser("profiler", "DIRECTORY")
+PROFILE_DURATION = config_parser("profiler", "DURATION", cast=float)
+PROFILE_INTERVAL = config_parser("profiler", "INTERVAL", cast=float) / 1000
+PROFILE_TOP = config_parser("profiler", "TOP", cast=int)
+SLOW_ITERATION = config_parser("profiler", "SLOW_ITERATION", cast=float) / 1000
+
+# Client config.
+KEYSTORE = config_parser("client", "KEYSTORE")
+KEY_SIZE = config_parser("client", "KEY_SIZE", cast=int)
+PREGENERATE_KEYS = config_parser("client", "PREGENERATE_KEYS", cast=int)
@@ -0,0 +1,126 @@
+import hashlib
+import os
+import threading
+import typing as t
+
+from rsa.key import PrivateKey, PublicKey
+
+from .rsa import RSA
+
+SPARE_DIRECTORY = "spare"
+
+
+class KeyStore:
+    __slots__ = ("directory", "key_size", "_lock")
+
+    def __init__(self, directory: str, key_size: int = 512) -> None:
+        self.directory = directory
+        self.key_size = key_size
+
+        # Guards claiming spare keys against the background generator.
+        self._lock = threading.Lock()
+
+    def _key_path(self, username: str) -> str:
+        # Hashed so any username maps to a safe, fixed-length file name.
+        name = hashlib.sha256(username.encode()).hexdigest()
+        return os.path.join(self.directory, f"{name}.pem")
+
+    @staticmethod
+    def _ensure_directory(directory: str) -> None:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    @staticmethod
+    def _write_private(path: str, data: bytes) -> None:
+        # Written to a temporary file readable by the owner only, then moved in place atomically.
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        descriptor = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(data)
+
+        os.replace(temporary_path, path)
+
+    @staticmethod
+    def _key_pair(private_key: PrivateKey) -> t.Tuple[PublicKey, PrivateKey]:
+        return PublicKey(private_key.n, private_key.e), private_key
+
+    def load(self, username: str) -> t.Optional[t.Tuple[PublicKey, PrivateKey]]:
+        try:
+            with open(self._key_path(username), "rb") as file:
+                return self._key_pair(PrivateKey.load_pkcs1(file.read()))
+        except (OSError, ValueError):
+            return None
+
+    def save(self, username: str, private_key: PrivateKey) -> None:
+        self._ensure_directory(self.directory)
+        self._write_private(self._key_path(username), private_key.save_pkcs1())
+
+    def _claim_spare(self, username: str) -> t.Optional[t.Tuple[PublicKey, PrivateKey]]:
+        spare_directory = os.path.join(self.directory, SPARE_DIRECTORY)
+
+        with self._lock:
+            try:
+                spares = sorted(os.listdir(spare_directory))
+            except OSError:
+                return None
+
+            for name in spares:
+                if not name.endswith(".pem"):
+                    continue
+
+                path = os.path.join(spare_directory, name)
+
+                try:
+                    # The rename is atomic, so two clients can never end up with the same spare.
+                    os.replace(path, self._key_path(username))
+                except OSError:
+                    continue
+
+                return self.load(username)
+
+        return None
+
+    def get_or_create(self, username: str, rotate: bool = False) -> t.Tuple[PublicKey, PrivateKey]:
+        # Generating a key is by far the slowest part of starting a client, so reuse what's on disk.
+        if not rotate:
+            keys = self.load(username)
+            if keys is not None:
+                return keys
+
+        self._ensure_directory(self.directory)
+
+        keys = self._claim_spare(username)
+        if keys is not None:
+            return keys
+
+        public_key, private_key = RSA.generate_keys(self.key_size)
+        self.save(username, private_key)
+
+        return public_key, private_key
+
+    def spare_count(self) -> int:
+        try:
+            return sum(name.endswith(".pem") for name in os.listdir(os.path.join(self.directory, SPARE_DIRECTORY)))
+        except OSError:
+            return 0
+
+    def pregenerate(self, count: int) -> int:
+        # Top the spare pool up to `count` keys, handed out to usernames that have none yet.
+        spare_directory = os.path.join(self.directory, SPARE_DIRECTORY)
+        self._ensure_directory(spare_directory)
+
+        generated = 0
+        while self.spare_count() < count:
+            _, private_key = RSA.generate_keys(self.key_size)
+            name = hashlib.sha256(private_key.save_pkcs1()).hexdigest()
+
+            self._write_private(os.path.join(spare_directory, f"{name}.pem"), private_key.save_pkcs1())
+            generated += 1
+
+        return generated
+
+    def pregenerate_in_background(self, count: int) -> threading.Thread:
+        thread = threading.Thread(target=self.pregenerate, args=(count,), name="keystore-pregenerate", daemon=True)
+        thread.start()
+
+        return thread
@@ -18,3 +18,11 @@ class RSA:
     @classmethod
     def sign_message(cls, message: bytes, private_key: PrivateKey, algorithm: str = "SHA-1") -> bytes:
         return rsa.sign(message, private_key, algorithm)
+
+    @classmethod
+    def encrypt(cls, message: bytes, public_key: PublicKey) -> bytes:
+        return rsa.encrypt(message, public_key)
+
+    @classmethod
+    def decrypt(cls, message: bytes, private_key: PrivateKey) -> bytes:
+        return rsa.decrypt(message, private_key)
@@ -0,0 +1,208 @@
+import collections
+import math
+import multiprocessing
+import socket
+import time
+import typing as t
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import rsa
+from rsa.key import PublicKey
+
+
+def verify_signature(message: bytes, signature: bytes, public_key: PublicKey) -> bool:
+    try:
+        rsa.verify(message, signature, public_key)
+    except rsa.VerificationError:
+        return False
+
+    return True
+
+
+def verify_batch(jobs: t.List[t.Tuple[bytes, bytes, PublicKey]]) -> t.List[bool]:
+    # Runs inside the worker processes, one call per batch to keep the IPC overhead off every message.
+    return [verify_signature(message, signature, public_key) for message, signature, public_key in jobs]
+
+
+def load_public_key(public_key_pem: bytes) -> t.Optional[PublicKey]:
+    try:
+        return PublicKey.load_pkcs1(public_key_pem)
+    except Exception:
+        return None
+
+
+def load_key_batch(public_key_pems: t.List[bytes]) -> t.List[t.Optional[PublicKey]]:
+    return [load_public_key(public_key_pem) for public_key_pem in public_key_pems]
+
+
+class Verification:
+    __slots__ = ("client", "signature", "message", "verified", "created")
+
+    def __init__(self, client: t.Any, signature: bytes, message: t.Any) -> None:
+        self.client = client
+        self.signature = signature
+        self.message = message
+
+        # When the message was read, so the full wait for the check can be measured.
+        self.created = time.perf_counter()
+
+        # None while pending, then the outcome of the check.
+        self.verified = None
+
+
+class KeyLoad:
+    __slots__ = ("handshake", "public_key_pem", "public_key", "done")
+
+    def __init__(self, handshake: t.Any, public_key_pem: bytes) -> None:
+        self.handshake = handshake
+        self.public_key_pem = public_key_pem
+
+        # The parsed key once done, None if it didn't parse.
+        self.public_key = None
+        self.done = False
+
+
+class VerificationPool:
+    __slots__ = ("workers", "_executor", "_batch", "_keys", "_completed", "_wakeup_reader", "_wakeup_writer")
+
+    def __init__(self, workers: int) -> None:
+        # With no workers signatures are checked inline, on the calling thread.
+        self.workers = workers
+        self._executor = None
+        if workers:
+            # Spawned rather than forked, so workers don't inherit the listening and client sockets.
+            self._executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+
+        # Jobs collected during the current loop iteration, and jobs whose result came back.
+        self._batch = []
+        self._keys = []
+        self._completed = collections.deque()
+
+        # Worker results are handed back to the event loop through this pair.
+        self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+        self._wakeup_reader.setblocking(False)
+        self._wakeup_writer.setblocking(False)
+
+    @property
+    def wakeup_socket(self) -> socket.socket:
+        return self._wakeup_reader
+
+    def submit(self, job: Verification) -> None:
+        if self._executor is None:
+            job.verified = verify_signature(job.message.data, job.signature, job.client.pub_key)
+            return
+
+        self._batch.append(job)
+
+    def load_key(self, job: KeyLoad) -> None:
+        # Parsing a PEM key is pure Python, handshakes from a reconnect storm would otherwise pile up on the loop.
+        if self._executor is None:
+            job.public_key = load_public_key(job.public_key_pem)
+            job.done = True
+            return
+
+        self._keys.append(job)
+
+    def flush(self) -> None:
+        if self._keys:
+            self._flush_keys()
+
+        # Spread the jobs gathered this iteration evenly over the workers.
+        if not self._batch:
+            return
+
+        batch, self._batch = self._batch, []
+        size = math.ceil(len(batch) / self.workers)
+
+        for start in range(0, len(batch), size):
+            jobs = batch[start:start + size]
+
+            try:
+                future = self._executor.submit(
+                    verify_batch, [(job.message.data, job.signature, job.client.pub_key) for job in jobs]
+                )
+            except RuntimeError:
+                # The pool broke (a worker died) or is shutting down, finish the checks here instead.
+                self._executor = None
+                self._verify_inline(batch[start:])
+                return
+
+            future.add_done_callback(lambda done, jobs=jobs: self._on_done(done, jobs))
+
+    def _flush_keys(self) -> None:
+        jobs, self._keys = self._keys, []
+
+        try:
+            future = self._executor.submit(load_key_batch, [job.public_key_pem for job in jobs])
+        except RuntimeError:
+            self._executor = None
+            self._load_keys_inline(jobs)
+            return
+
+        future.add_done_callback(lambda done: self._on_keys_loaded(done, jobs))
+
+    def _load_keys_inline(self, jobs: t.List[KeyLoad]) -> None:
+        for job in jobs:
+            job.public_key = load_public_key(job.public_key_pem)
+            job.done = True
+
+        self._completed.extend(jobs)
+        self._wake_up()
+
+    def _on_keys_loaded(self, future: Future, jobs: t.List[KeyLoad]) -> None:
+        try:
+            results = future.result()
+        except Exception:
+            self._load_keys_inline(jobs)
+            return
+
+        for job, public_key in zip(jobs, results):
+            job.public_key = public_key
+            job.done = True
+
+        self._completed.extend(jobs)
+        self._wake_up()
+
+    def _verify_inline(self, jobs: t.List[Verification]) -> None:
+        for job in jobs:
+            job.verified = verify_signature(job.message.data, job.signature, job.client.pub_key)
+
+        self._completed.extend(jobs)
+        self._wake_up()
+
+    def _on_done(self, future: Future, jobs: t.List[Verification]) -> None:
+        # Called from the executor's thread, only touches the jobs and the thread-safe deque.
+        try:
+            results = future.result()
+        except Exception:
+            self._verify_inline(jobs)
+            return
+
+        for job, verified in zip(jobs, results):
+            job.verified = verified
+
+        self._completed.extend(jobs)
+        self._wake_up()
+
+    def _wake_up(self) -> None:
+        try:
+            self._wakeup_writer.send(b"\0")
+        except OSError:
+            pass
+
+    def completed(self) -> t.Iterator[t.Union[Verification, KeyLoad]]:
+        try:
+            while self._wakeup_reader.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+        while self._completed:
+            yield self._completed.popleft()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+        self._wakeup_reader.close()
+        self._wakeup_writer.close()
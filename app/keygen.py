@@ -0,0 +1,24 @@
+import sys
+
+from .config import KEYSTORE, KEY_SIZE
+from .encryption.keystore import KeyStore
+from .utils.contextmanagers import Timer
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in {"--rotate", "--spares"}:
+        print("Usage: python -m app.keygen --rotate <USERNAME> | --spares <COUNT>")
+        sys.exit(1)
+
+    if not KEYSTORE:
+        print("The keystore is disabled, set KEYSTORE in the [client] section of the config.")
+        sys.exit(1)
+
+    _, ACTION, VALUE = sys.argv
+    keystore = KeyStore(KEYSTORE, KEY_SIZE)
+
+    if ACTION == "--rotate":
+        with Timer(lambda x: print(f"Generated a new key for {VALUE} in {x}ms.")):
+            keystore.get_or_create(VALUE, rotate=True)
+    else:
+        with Timer(lambda x: print(f"Spare pool topped up to {VALUE} keys in {x}ms.")):
+            keystore.pregenerate(int(VALUE))
@@ -1,3 +1,4 @@
+from ..config import HEADLESS
 from ..utils import Logger
 
 
@@ -7,5 +8,8 @@ class LoggingMixin:
         try:
             return self._log
         except AttributeError:
-            self._log = Logger()
+            self._log = self.create_logger()
             return self._log
+
+    def create_logger(self) -> Logger:
+        return Logger(log_format="plain" if HEADLESS else "ansi")
@@ -0,0 +1,111 @@
+import selectors
+import socket
+import typing as t
+import urllib.parse
+
+# Requests are tiny GETs, anything bigger is not meant for this endpoint.
+MAX_REQUEST_SIZE = 8192
+
+STATUS_LINES = {
+    200: "200 OK",
+    400: "400 Bad Request",
+    404: "404 Not Found",
+}
+
+
+class AdminServer:
+    __slots__ = ("address", "routes", "socket", "selector", "requests")
+
+    def __init__(self, address: tuple, routes: t.Dict[str, t.Callable[[t.Dict[str, str]], str]]) -> None:
+        # Path -> handler taking the query parameters and returning the plain text body.
+        self.address = address
+        self.routes = routes
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+        self.selector = None
+
+        # Partial requests by connection.
+        self.requests = {}
+
+    def attach(self, selector: selectors.BaseSelector) -> None:
+        self.socket.bind(self.address)
+        self.socket.listen()
+        self.socket.setblocking(False)
+
+        # Served from the chat event loop, requests are rare and cheap to answer.
+        self.selector = selector
+        self.selector.register(self.socket, selectors.EVENT_READ, self.process_connection)
+
+    def process_connection(self, admin_socket: socket.socket, _mask: int) -> None:
+        connection, _address = admin_socket.accept()
+        connection.setblocking(False)
+
+        self.requests[connection] = b""
+        self.selector.register(connection, selectors.EVENT_READ, self.process_request)
+
+    def process_request(self, connection: socket.socket, _mask: int) -> None:
+        try:
+            data = connection.recv(MAX_REQUEST_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+
+        if not data:
+            self.close_connection(connection)
+            return
+
+        request = self.requests[connection] + data
+        if b"\r\n\r\n" not in request and len(request) < MAX_REQUEST_SIZE:
+            self.requests[connection] = request
+            return
+
+        status, body = self.handle(request.split(b"\r\n", 1)[0])
+        self.respond(connection, status, body)
+
+    def handle(self, request_line: bytes) -> t.Tuple[int, str]:
+        parts = request_line.decode("latin-1").split()
+        if len(parts) != 3 or parts[0] != "GET":
+            return 400, "Only GET requests are supported.\n"
+
+        path, _, query = parts[1].partition("?")
+
+        handler = self.routes.get(path)
+        if handler is None:
+            return 404, f"Available: {', '.join(sorted(self.routes))}\n"
+
+        return 200, handler(dict(urllib.parse.parse_qsl(query)))
+
+    def respond(self, connection: socket.socket, status: int, body: str) -> None:
+        body = body.encode()
+        head = (
+            f"HTTP/1.0 {STATUS_LINES[status]}\r\n"
+            "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode()
+
+        # Local scrapers read promptly, a short blocking write keeps this simple.
+        try:
+            connection.settimeout(1)
+            connection.sendall(head + body)
+        except OSError:
+            pass
+
+        self.close_connection(connection)
+
+    def close_connection(self, connection: socket.socket) -> None:
+        self.requests.pop(connection, None)
+        self.selector.unregister(connection)
+        connection.close()
+
+    def close(self) -> None:
+        for connection in list(self.requests):
+            self.close_connection(connection)
+
+        if self.selector is not None:
+            self.selector.unregister(self.socket)
+
+        self.socket.close()
@@ -0,0 +1,275 @@
+import asyncio
+import collections
+import random
+import typing as t
+
+from .client import Client, ConnectionClosedError, HandshakeError
+from ..protocol import framing
+from ..protocol.framing import FrameType, ProtocolError
+
+# Seconds allowed for connecting and the handshake, which run on a worker thread.
+CONNECT_TIMEOUT = 10
+
+# Messages signed and written per `sendall`, pipelining keeps the socket busy without a round trip each.
+WRITE_BATCH = 64
+
+# Marks the end of the incoming messages once the client is closed for good.
+_CLOSED = object()
+
+
+# Asyncio wrapper around `Client` for bots and integrations. The handshake and message signing are the
+# blocking client's own, reads are driven by loop readiness and writes by a single writer task.
+class AsyncClient(Client):
+    __slots__ = (
+        "reconnect",
+        "min_backoff",
+        "max_backoff",
+        "pending_limit",
+        "pending",
+        "incoming",
+        "closed",
+        "_loop",
+        "_connected",
+        "_wakeup",
+        "_writable",
+        "_drained",
+        "_writer",
+        "_reconnector",
+    )
+
+    def __init__(
+        self,
+        address: tuple,
+        username: str,
+        *args,
+        reconnect: bool = True,
+        min_backoff: float = 0.5,
+        max_backoff: float = 30,
+        pending_limit: int = 10_000,
+        **kwargs
+    ) -> None:
+        super().__init__(address, username, *args, **kwargs)
+
+        self.reconnect = reconnect
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+        # Messages not written yet. `send` waits once `pending_limit` of them are queued.
+        self.pending_limit = pending_limit
+        self.pending = collections.deque()
+        self.incoming = None
+        self.closed = False
+
+        # Loop primitives are created in `connect`, inside the running loop.
+        self._loop = None
+        self._connected = None
+        self._wakeup = None
+        self._writable = None
+        self._drained = None
+        self._writer = None
+        self._reconnector = None
+
+    async def __aenter__(self) -> "AsyncClient":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def __aiter__(self) -> "AsyncClient":
+        return self
+
+    async def __anext__(self) -> t.Tuple[str, str]:
+        message = await self.incoming.get()
+
+        if message is _CLOSED:
+            # Let every other reader stop as well.
+            self.incoming.put_nowait(_CLOSED)
+            raise StopAsyncIteration
+
+        return message
+
+    async def connect(self) -> None:
+        # Raises `OSError` or `HandshakeError` if the first connection fails, later ones are retried.
+        self._loop = asyncio.get_running_loop()
+
+        self.incoming = asyncio.Queue()
+        self._connected = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._drained = asyncio.Event()
+
+        self._writable.set()
+        self._drained.set()
+
+        await self._open()
+        self._writer = self._loop.create_task(self._write_loop())
+
+    async def send(self, message: str) -> None:
+        # Returns once the message is queued, it is signed right before being written.
+        if self.closed:
+            raise ConnectionClosedError("Client is closed.")
+
+        if not message:
+            return
+
+        while len(self.pending) >= self.pending_limit:
+            self._writable.clear()
+            await self._writable.wait()
+
+        self.pending.append(message)
+        self._drained.clear()
+        self._wakeup.set()
+
+    async def flush(self) -> None:
+        # Waits until everything queued so far has been written.
+        await self._drained.wait()
+
+    async def close(self) -> None:
+        if self.closed:
+            return
+
+        self.closed = True
+
+        # Never connected, nothing to tear down.
+        if self._loop is None:
+            return
+
+        for task in (self._writer, self._reconnector):
+            if task is not None:
+                task.cancel()
+
+        self._detach()
+        self.incoming.put_nowait(_CLOSED)
+
+    async def _open(self) -> None:
+        self.reset()
+        self.socket.settimeout(CONNECT_TIMEOUT)
+
+        try:
+            await self._loop.run_in_executor(None, self._connect_blocking)
+        except BaseException:
+            self.socket.close()
+            raise
+
+        self._loop.add_reader(self.socket.fileno(), self._on_readable)
+        self._connected.set()
+
+    def _connect_blocking(self) -> None:
+        resuming = self.resumption is not None
+
+        self.socket.connect((self.host, self.port))
+
+        try:
+            self.handshake()
+        except (HandshakeError, ProtocolError, OSError):
+            if not resuming:
+                raise
+
+            # The token expired, or was issued by another worker or before a restart. Start over in full.
+            self.socket.close()
+            self.reset()
+            self.socket.settimeout(CONNECT_TIMEOUT)
+
+            self.socket.connect((self.host, self.port))
+            self.handshake()
+
+    def _detach(self) -> None:
+        if self._connected.is_set():
+            self._connected.clear()
+            self._loop.remove_reader(self.socket.fileno())
+
+        self.socket.close()
+
+    def _connection_lost(self, exc: Exception) -> None:
+        if not self._connected.is_set():
+            return
+
+        self._detach()
+
+        if self.closed:
+            return
+
+        if not self.reconnect:
+            self.logger.error(f"Connection lost. {exc}")
+
+            self.closed = True
+            self.incoming.put_nowait(_CLOSED)
+
+            # Unblock anyone waiting on a connection that won't come back.
+            self._writable.set()
+            self._drained.set()
+            return
+
+        self.logger.warning(f"Connection lost, reconnecting. {exc}")
+        self._reconnector = self._loop.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = self.min_backoff
+
+        while not self.closed:
+            # Jittered, so a server restart isn't met by every client at the same instant.
+            await asyncio.sleep(delay * random.uniform(0.5, 1))
+
+            try:
+                await self._open()
+            except (HandshakeError, OSError, ProtocolError) as exc:
+                delay = min(delay * 2, self.max_backoff)
+                self.logger.warning(f"Reconnecting failed, retrying in up to {delay:g}s. {exc}")
+                continue
+
+            self.logger.success(f"Reconnected to [{self.host}:{self.port}]")
+            return
+
+    def _on_readable(self) -> None:
+        try:
+            for message in self.receive_messages():
+                self.incoming.put_nowait(message)
+        except (BlockingIOError, InterruptedError):
+            pass
+        except (ConnectionClosedError, OSError, ProtocolError) as exc:
+            self._connection_lost(exc)
+
+    def _pong(self, payload: bytes) -> None:
+        # Goes out ahead of queued messages, through the writer like everything else.
+        self.pending.appendleft(framing.encode_frame(FrameType.PONG, 0, payload))
+        self._drained.clear()
+        self._wakeup.set()
+
+    def _encode_batch(self, messages: list) -> t.List[bytes]:
+        return [message if isinstance(message, bytes) else self.encode_message(message) for message in messages]
+
+    async def _write_loop(self) -> None:
+        while True:
+            await self._connected.wait()
+
+            if not self.pending:
+                self._drained.set()
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            # Signed at write time, so messages queued across a reconnect use the new session.
+            messages = []
+            while self.pending and len(messages) < WRITE_BATCH:
+                messages.append(self.pending.popleft())
+
+            if self.session is not None:
+                batch = self._encode_batch(messages)
+            else:
+                # RSA signatures take milliseconds each, they're made on a worker thread so reads and pings go on.
+                batch = await self._loop.run_in_executor(None, self._encode_batch, messages)
+
+                # Reconnected in the meantime: sent again once connected, signed for the session if there is one now.
+                if self.session is not None or not self._connected.is_set():
+                    self.pending.extendleft(reversed(messages))
+                    continue
+
+            if len(self.pending) < self.pending_limit:
+                self._writable.set()
+
+            # At most once, a batch cut short by a dropped connection isn't sent again.
+            try:
+                await self._loop.sock_sendall(self.socket, b"".join(batch))
+            except OSError as exc:
+                self._connection_lost(exc)
@@ -0,0 +1,111 @@
+import enum
+import os
+import struct
+import time
+import typing as t
+
+# Start of every capture file, followed by the format version.
+MAGIC = b"ZCAP"
+VERSION = 1
+FILE_HEADER = struct.Struct("!4sB")
+
+# Microseconds since the capture started, connection, event, payload length.
+RECORD_HEADER = struct.Struct("!QIBI")
+
+CAPTURE_SUFFIX = ".zcap"
+
+# Records are small, they're collected in memory and written to the file in chunks of this size.
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+class CaptureEvent(enum.IntEnum):
+    # A client was admitted. Payload: protocol version (0 for legacy headers), then the username.
+    CONNECT = 1
+    # A message as the client sent it, before the signature check. Signatures aren't kept, a replay signs again.
+    MESSAGE = 2
+    # The connection was closed.
+    CLOSE = 3
+
+
+# Timestamped record of what clients send, for `benchmarks.replay` to play back. Connections are told apart
+# by file descriptor, a descriptor is only reused after the CLOSE of the connection that had it before.
+class CaptureWriter:
+    __slots__ = ("path", "max_size", "size", "started", "_file")
+
+    def __init__(self, path: str, max_size: int) -> None:
+        self.path = path
+        self.max_size = max_size
+        self.size = 0
+
+        self.started = None
+        self._file = None
+
+    @property
+    def active(self) -> bool:
+        return self._file is not None
+
+    def open(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        self._file = open(self.path, "wb", buffering=WRITE_BUFFER_SIZE)
+        self._file.write(FILE_HEADER.pack(MAGIC, VERSION))
+
+        self.size = FILE_HEADER.size
+        self.started = time.monotonic()
+
+    def record(self, event: CaptureEvent, connection: int, payload: t.Union[bytes, memoryview] = b"") -> None:
+        if self._file is None:
+            return
+
+        size = RECORD_HEADER.size + len(payload)
+
+        # Stops at the limit for good, a capture with holes in it wouldn't replay the same.
+        if self.size + size > self.max_size:
+            self.close()
+            return
+
+        elapsed = int((time.monotonic() - self.started) * 1_000_000)
+
+        self._file.write(RECORD_HEADER.pack(elapsed, connection, event, len(payload)))
+        self._file.write(payload)
+        self.size += size
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def capture_path(directory: str, worker: t.Optional[int] = None) -> str:
+    # A new file per start, so a restarted server never overwrites a capture that is about to be replayed.
+    name = time.strftime("%Y%m%d-%H%M%S")
+    if worker is not None:
+        name += f"-worker-{worker}"
+
+    return os.path.join(directory, f"{name}{CAPTURE_SUFFIX}")
+
+
+def read_capture(path: str) -> t.Iterator[t.Tuple[float, int, CaptureEvent, bytes]]:
+    # Yields `(seconds since the start, connection, event, payload)`. A record cut short by a crash ends it.
+    with open(path, "rb") as file:
+        header = file.read(FILE_HEADER.size)
+
+        if len(header) < FILE_HEADER.size or FILE_HEADER.unpack(header)[0] != MAGIC:
+            raise ValueError(f"{path} is not a capture file.")
+
+        version = FILE_HEADER.unpack(header)[1]
+        if version != VERSION:
+            raise ValueError(f"Unsupported capture version {version}.")
+
+        while True:
+            header = file.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+
+            elapsed, connection, event, length = RECORD_HEADER.unpack(header)
+
+            payload = file.read(length)
+            if len(payload) < length:
+                return
+
+            yield elapsed / 1_000_000, connection, CaptureEvent(event), payload
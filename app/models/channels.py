@@ -0,0 +1,49 @@
+import typing as t
+
+MAX_CHANNEL_NAME_LENGTH = 32
+
+
+class ChannelIndex:
+    __slots__ = ("default", "_members")
+
+    def __init__(self, default: str) -> None:
+        self.default = default
+
+        # Channel name -> clients currently in it. The default channel always exists.
+        self._members = {default: set()}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._members
+
+    @staticmethod
+    def is_valid_name(name: str) -> bool:
+        return 0 < len(name) <= MAX_CHANNEL_NAME_LENGTH and name.isprintable() and not any(
+            char.isspace() for char in name
+        )
+
+    def members(self, name: str) -> t.AbstractSet:
+        return self._members.get(name, frozenset())
+
+    def join(self, client: t.Any, name: str) -> None:
+        # A client sits in exactly one channel, joining another one moves it.
+        self.leave(client)
+
+        self._members.setdefault(name, set()).add(client)
+        client.channel = name
+
+    def leave(self, client: t.Any) -> None:
+        name = client.channel
+        if name is None:
+            return
+
+        members = self._members.get(name)
+        if members is not None:
+            members.discard(client)
+
+            if not members and name != self.default:
+                del self._members[name]
+
+        client.channel = None
+
+    def listing(self) -> t.List[t.Tuple[str, int]]:
+        return sorted((name, len(members)) for name, members in self._members.items())
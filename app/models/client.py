@@ -3,35 +3,87 @@ import sys
 import time
 import typing as t
 
-from ..config import HEADER_LENGTH
+from ..config import (
+    COMPRESSION,
+    COMPRESSION_THRESHOLD,
+    FRAMING,
+    HEADER_LENGTH,
+    KEYSTORE,
+    KEY_SIZE,
+    PREGENERATE_KEYS,
+    SESSION_MAC,
+)
+from ..encryption.keystore import KeyStore
 from ..encryption.rsa import RSA
+from ..encryption.session import Session
 from ..mixins.logging import LoggingMixin
+from ..protocol import BinaryDecoder, LegacyDecoder, ReadBuffer, encode_compressed_frame, framing
+from ..protocol.framing import Capability, FrameType
 from ..utils import on_startup
 
 
+class HandshakeError(Exception):
+    pass
+
+
+class ConnectionClosedError(Exception):
+    pass
+
+
 class Client(LoggingMixin):
     __slots__ = (
         "host",
         "port",
         "username",
+        "framing_mode",
         "socket",
         "start_timer",
         "startup_duration",
         "PRIVATE_KEY",
         "PUBLIC_KEY",
-        "motd"
+        "motd",
+        "protocol",
+        "client_id",
+        "read_buffer",
+        "decoder",
+        "received_bytes",
+        "capabilities",
+        "session",
+        "resumption"
     )
 
-    def __init__(self, address: tuple, username: str) -> None:
+    def __init__(
+        self,
+        address: tuple,
+        username: str,
+        framing_mode: str = FRAMING,
+        keystore: t.Optional[KeyStore] = None,
+        rotate_key: bool = False
+    ) -> None:
         self.host, self.port = address
         self.username = username
+        self.framing_mode = framing_mode
 
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.reset()
+        self.received_bytes = 0
+
+        # Token and session handed out by the server, used by the next connection to skip the full handshake.
+        self.resumption = None
 
         self.start_timer = time.perf_counter()
         self.startup_duration = None
 
-        self.PUBLIC_KEY, self.PRIVATE_KEY = RSA.generate_keys(512)
+        if keystore is None and KEYSTORE:
+            keystore = KeyStore(KEYSTORE, KEY_SIZE)
+
+        # Reuse the stored key for this username, only generate one when there's none or on rotation.
+        if keystore is not None:
+            self.PUBLIC_KEY, self.PRIVATE_KEY = keystore.get_or_create(username, rotate_key)
+
+            if PREGENERATE_KEYS:
+                keystore.pregenerate_in_background(PREGENERATE_KEYS)
+        else:
+            self.PUBLIC_KEY, self.PRIVATE_KEY = RSA.generate_keys(KEY_SIZE)
 
         self.motd = None
 
@@ -39,6 +91,21 @@ class Client(LoggingMixin):
     def get_header(message: bytes) -> bytes:
         return f"{len(message):<{HEADER_LENGTH}}".encode()
 
+    def reset(self) -> None:
+        # Fresh socket and connection state, keys are kept. Also used to reconnect.
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+        # Negotiated protocol version, 0 stays on the legacy ASCII headers.
+        self.protocol = framing.PROTOCOL_VERSION if self.framing_mode == "binary" else 0
+        self.client_id = None
+
+        # Features offered at handshake, narrowed down to what the server accepted.
+        self.capabilities = framing.enabled_capabilities(SESSION_MAC, COMPRESSION, heartbeat=True, resume=True)
+        self.session = None
+
+        self.read_buffer = ReadBuffer()
+        self.decoder = None
+
     def connect(self) -> None:
         try:
             self.socket.connect((self.host, self.port))
@@ -59,13 +126,8 @@ class Client(LoggingMixin):
 
         self.logger.success(f"Connected to remote host at [{self.host}:{self.port}]")
 
-    def initialize(self) -> None:
-        # Send the specified uname.
-        uname = self.username.encode()
+    def _legacy_handshake(self, uname: bytes, exported_public_key: bytes) -> None:
         uname_header = self.get_header(uname)
-
-        # Key auth
-        exported_public_key = RSA.export_key_pkcs1(self.PUBLIC_KEY, "PEM")
         public_key_header = self.get_header(exported_public_key)
 
         # Send the message
@@ -73,38 +135,150 @@ class Client(LoggingMixin):
         self.socket.send(public_key_header + exported_public_key)
 
         # Receive the MOTD
-        motd_len = int(self.socket.recv(HEADER_LENGTH).decode().strip())
+        motd_header = self.socket.recv(HEADER_LENGTH)
+        if not motd_header:
+            raise HandshakeError("Connection closed during the handshake.")
+
+        motd_len = int(motd_header.decode().strip())
         self.motd = self.socket.recv(motd_len).decode().strip()
 
+    def _binary_handshake(self, uname: bytes, exported_public_key: bytes) -> None:
+        # A token from the last connection replaces the username and key. It is single use either way.
+        resumption, self.resumption = self.resumption, None
+
+        if resumption is not None:
+            hello = framing.encode_frame(FrameType.RESUME, 0, resumption[0])
+        else:
+            hello = framing.encode_frame(FrameType.HELLO, 0, *framing.pack_hello(uname, exported_public_key))
+
+        # Preamble and hello are pipelined, the server answers with the version it settled on.
+        self.socket.send(framing.encode_preamble(self.protocol, self.capabilities) + hello)
+
+        preamble = framing.recv_exact(self.socket, framing.PREAMBLE.size)
+        if not preamble:
+            raise HandshakeError("Connection closed during the handshake.")
+
+        self.protocol, self.capabilities = framing.decode_preamble(preamble)
+
+        token = None
+        frame = framing.recv_frame(self.socket)
+
+        while frame and frame.type in (FrameType.SESSION, FrameType.RESUME):
+            if frame.type == FrameType.SESSION and self.capabilities & Capability.SESSION_MAC:
+                self.session = Session(RSA.decrypt(frame.payload, self.PRIVATE_KEY))
+            elif frame.type == FrameType.RESUME and self.capabilities & Capability.RESUME:
+                token = RSA.decrypt(frame.payload, self.PRIVATE_KEY)
+
+            frame = framing.recv_frame(self.socket)
+
+        if not frame or frame.type != FrameType.WELCOME:
+            reason = frame.payload.decode() if frame and frame.type == FrameType.ERROR else "No reason given."
+            raise HandshakeError(reason)
+
+        # A resumed session carries on with its secret and sequence numbers, unless the server started a new one.
+        if resumption is not None and self.session is None and self.capabilities & Capability.SESSION_MAC:
+            self.session = resumption[1]
+
+        self.client_id = frame.sender_id
+
+        # Resumed connections aren't sent the MOTD again.
+        motd = frame.payload.decode().strip()
+        if motd or resumption is None:
+            self.motd = motd
+
+        if token is not None:
+            self.resumption = (token, self.session)
+
+    def handshake(self) -> None:
+        # Raises `HandshakeError` when the server refuses the connection.
+
+        # Send the specified uname.
+        uname = self.username.encode()
+
+        # Key auth
+        exported_public_key = RSA.export_key_pkcs1(self.PUBLIC_KEY, "PEM")
+
+        if self.protocol:
+            self._binary_handshake(uname, exported_public_key)
+        else:
+            self._legacy_handshake(uname, exported_public_key)
+
+        # Frames are reassembled from here on, whatever the socket returns per read.
+        if self.protocol:
+            self.decoder = BinaryDecoder(bool(self.capabilities & Capability.COMPRESSION))
+        else:
+            self.decoder = LegacyDecoder(HEADER_LENGTH)
+
         # Set blocking to false.
         self.socket.setblocking(False)
 
+    def initialize(self, display_banner: bool = True) -> None:
+        try:
+            self.handshake()
+        except HandshakeError as exc:
+            self.logger.error(f"Server refused the connection. {exc}")
+            sys.exit(1)
+
         # Display banner
-        self.display_connected_banner()
+        if display_banner:
+            self.display_connected_banner()
 
-    def receive_message(self) -> tuple:
-        username_header = self.socket.recv(HEADER_LENGTH)
+    def receive_messages(self) -> t.Iterator[t.Tuple[str, str]]:
+        received = self.read_buffer.recv_into(self.socket)
+        if not received:
+            raise ConnectionClosedError("Server has closed the connection.")
 
-        if not len(username_header):
-            self.logger.error("Server has closed the connection.")
-            sys.exit(1)
+        self.received_bytes += received
 
-        username_len = int(username_header.decode().strip())
-        username = self.socket.recv(username_len).decode()
+        if not self.protocol:
+            for username, msg in self.decoder.pairs(self.read_buffer):
+                yield username.decode(), str(msg, "utf-8")
 
-        msg_length = int(self.socket.recv(HEADER_LENGTH).decode().strip())
-        msg = self.socket.recv(msg_length).decode()
+            return
 
-        return username, msg
+        for frame in self.decoder.frames(self.read_buffer):
+            if frame.type == FrameType.PING:
+                self._pong(frame.payload)
+                continue
 
-    def send_message(self, message: t.Optional[str] = None) -> None:
-        if message:
-            message_bytes = message.replace("\n", "").encode()
-            message_header = self.get_header(message_bytes)
+            if frame.type not in (FrameType.MESSAGE, FrameType.DIRECT):
+                yield "SERVER", str(frame.payload, "utf-8")
+                continue
+
+            username, msg = framing.unpack_relayed(frame.payload)
+            username = str(username, "utf-8")
+
+            if frame.type == FrameType.DIRECT:
+                username += " (private)"
+
+            yield username, str(msg, "utf-8")
+
+    def _pong(self, payload: bytes) -> None:
+        # The server only pings quiet connections, the send buffer has room for the reply.
+        try:
+            self.socket.send(framing.encode_frame(FrameType.PONG, 0, payload))
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def encode_message(self, message: str) -> bytes:
+        message_bytes = message.replace("\n", "").encode()
 
-            # Key auth
+        # Key auth, a session HMAC replaces the RSA signature once negotiated.
+        if self.session is not None:
+            key_sign = self.session.sign(message_bytes)
+        else:
             key_sign = RSA.sign_message(message_bytes, self.PRIVATE_KEY)
-            key_sign_header = self.get_header(key_sign)
 
-            self.socket.send(key_sign_header + key_sign)
-            self.socket.send(message_header + message_bytes)
+        if self.protocol and self.capabilities & Capability.COMPRESSION:
+            return encode_compressed_frame(
+                FrameType.MESSAGE, 0, *framing.pack_signed(key_sign, message_bytes), threshold=COMPRESSION_THRESHOLD
+            )
+
+        if self.protocol:
+            return framing.encode_frame(FrameType.MESSAGE, 0, *framing.pack_signed(key_sign, message_bytes))
+
+        return self.get_header(key_sign) + key_sign + self.get_header(message_bytes) + message_bytes
+
+    def send_message(self, message: t.Optional[str] = None) -> None:
+        if message:
+            self.socket.send(self.encode_message(message))
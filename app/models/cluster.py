@@ -0,0 +1,305 @@
+import enum
+import itertools
+import multiprocessing
+import os
+import selectors
+import signal
+import socket
+import struct
+import typing as t
+
+from ..config import HEADER_LENGTH
+from ..mixins.logging import LoggingMixin
+from ..protocol import BinaryDecoder, OutboundQueue, ReadBuffer, SlowConsumerPolicy, framing
+
+_NAME_LENGTH = struct.Struct("!B")
+
+# Relays to a worker that fell this far behind are dropped rather than buffered without bound.
+BUS_HIGH_WATERMARK = 64 * 1024 * 1024
+BUS_LOW_WATERMARK = 16 * 1024 * 1024
+
+
+class BusFrame(enum.IntEnum):
+    # Worker -> hub: claim a username for a connecting client, answered with CLAIM_RESULT.
+    CLAIM = 1
+    CLAIM_RESULT = 2
+    # Worker -> hub: the username is free again.
+    RELEASE = 3
+    # Worker -> hub -> every other worker: a message to deliver to the local members of a channel.
+    RELAY = 4
+    # Hub -> workers: presence updates.
+    JOINED = 5
+    LEFT = 6
+    # Worker -> hub -> the worker the recipient is connected to: a private message.
+    DIRECT = 7
+
+
+def pack_relay(channel: bytes, username: bytes, body: bytes) -> t.Tuple[bytes, ...]:
+    return _NAME_LENGTH.pack(len(channel)), channel, _NAME_LENGTH.pack(len(username)), username, body
+
+
+def unpack_relay(payload: memoryview) -> t.Tuple[bytes, bytes, memoryview]:
+    channel, rest = framing.unpack_relayed(payload)
+    username, body = framing.unpack_relayed(rest)
+
+    return bytes(channel), bytes(username), body
+
+
+class RemoteClient:
+    # Stand-in for a sender connected to another worker, carries what broadcasting needs.
+    __slots__ = ("socket", "client_id", "username", "raw_username", "relay_prefix", "channel")
+
+    def __init__(self, client_id: int, raw_username: bytes, channel: t.Optional[str]) -> None:
+        self.socket = None
+        self.client_id = client_id
+
+        self.raw_username = raw_username
+        self.relay_prefix = framing.pack_relayed_prefix(raw_username)
+        self.username = raw_username.decode()
+
+        self.channel = channel
+
+    @property
+    def username_header(self) -> bytes:
+        return f"{len(self.raw_username):<{HEADER_LENGTH}}".encode()
+
+
+class BusConnection:
+    # One end of the unix socket between the hub and a worker. Writes are queued like client writes, so
+    # neither side ever blocks on the other.
+    __slots__ = ("socket", "read_buffer", "decoder", "outbound", "selector", "callback")
+
+    def __init__(self, bus_socket: socket.socket) -> None:
+        self.socket = bus_socket
+        self.socket.setblocking(False)
+
+        self.read_buffer = ReadBuffer()
+        self.decoder = BinaryDecoder()
+        self.outbound = OutboundQueue(BUS_HIGH_WATERMARK, BUS_LOW_WATERMARK, SlowConsumerPolicy.DROP)
+
+        self.selector = None
+        self.callback = None
+
+    def attach(self, selector: selectors.BaseSelector, callback: t.Callable) -> None:
+        self.selector = selector
+        self.callback = callback
+
+        selector.register(self.socket, selectors.EVENT_READ, callback)
+
+    def send(self, frame_type: int, sender_id: int, *parts: bytes) -> None:
+        was_empty = not self.outbound
+        self.outbound.push(framing.encode_frame(frame_type, sender_id, *parts))
+
+        if was_empty:
+            self.outbound.flush(self.socket)
+
+            if self.outbound:
+                self.selector.modify(self.socket, selectors.EVENT_READ | selectors.EVENT_WRITE, self.callback)
+
+    def process_writable(self) -> None:
+        self.outbound.flush(self.socket)
+
+        if not self.outbound:
+            self.selector.modify(self.socket, selectors.EVENT_READ, self.callback)
+
+    def frames(self) -> t.Iterator[framing.Frame]:
+        # Raises EOFError once the other end is gone.
+        try:
+            received = self.read_buffer.recv_into(self.socket)
+        except (BlockingIOError, InterruptedError):
+            return
+
+        if not received:
+            raise EOFError("The other end closed the bus.")
+
+        yield from self.decoder.frames(self.read_buffer)
+
+    def close(self) -> None:
+        if self.selector is not None:
+            self.selector.unregister(self.socket)
+
+        self.socket.close()
+
+
+class ClusterLink(BusConnection):
+    # Worker side of the bus.
+    __slots__ = ("index", "count")
+
+    def __init__(self, bus_socket: socket.socket, index: int, count: int) -> None:
+        super().__init__(bus_socket)
+
+        self.index = index
+        self.count = count
+
+    def client_ids(self) -> t.Iterator[int]:
+        # Interleaved so ids stay unique across the whole cluster.
+        return itertools.count(self.index + 1, self.count)
+
+
+class _Worker(BusConnection):
+    __slots__ = ("index", "process")
+
+    def __init__(self, index: int, process: multiprocessing.Process, bus_socket: socket.socket) -> None:
+        super().__init__(bus_socket)
+
+        self.index = index
+        self.process = process
+
+
+def _run_worker(
+    target: t.Callable[[int, int, socket.socket], None],
+    hub_sockets: t.List[socket.socket],
+    index: int,
+    count: int,
+    worker_socket: socket.socket,
+) -> None:
+    # A worker holding on to the hub's ends would never see the bus close when the hub goes away.
+    for hub_socket in hub_sockets:
+        hub_socket.close()
+
+    target(index, count, worker_socket)
+
+
+class ClusterHub(LoggingMixin):
+    # Runs in the parent process: starts the workers, owns the cluster-wide username registry and relays
+    # broadcasts between workers. Workers share the listening port through SO_REUSEPORT.
+    __slots__ = ("count", "workers", "usernames", "selector")
+
+    def __init__(self, count: int) -> None:
+        self.count = count
+        self.workers = []
+
+        # Username -> the worker its connection lives on.
+        self.usernames = {}
+
+        self.selector = selectors.DefaultSelector()
+
+    def start(self, target: t.Callable[[int, int, socket.socket], None]) -> None:
+        # Forked before any listening or client socket exists, each worker binds its own.
+        context = multiprocessing.get_context("fork")
+
+        for index in range(self.count):
+            hub_socket, worker_socket = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+
+            # The hub's ends of this and every earlier pair are inherited as well.
+            hub_sockets = [worker.socket for worker in self.workers] + [hub_socket]
+
+            process = context.Process(
+                target=_run_worker,
+                args=(target, hub_sockets, index, self.count, worker_socket),
+                name=f"zerocom-worker-{index}",
+            )
+            process.start()
+            worker_socket.close()
+
+            worker = _Worker(index, process, hub_socket)
+            worker.attach(self.selector, worker)
+
+            self.workers.append(worker)
+
+        # `kill -USR1` on the server's PID profiles every worker. Installed after forking, workers have their own.
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, self._forward_signal)
+
+    def _forward_signal(self, signum: int, _frame: t.Any) -> None:
+        for worker in self.workers:
+            if worker.process.is_alive():
+                os.kill(worker.process.pid, signum)
+
+    def _broadcast(self, frame_type: BusFrame, sender_id: int, payload: bytes, origin: _Worker) -> None:
+        lost = []
+
+        for worker in self.workers:
+            if worker is not origin:
+                try:
+                    worker.send(frame_type, sender_id, payload)
+                except OSError:
+                    lost.append(worker)
+
+        for worker in lost:
+            self._remove(worker)
+
+    def _handle(self, worker: _Worker, frame: framing.Frame) -> None:
+        if frame.type == BusFrame.RELAY:
+            # Forwarded as is, the payload is never decoded on the hub.
+            self._broadcast(BusFrame.RELAY, frame.sender_id, frame.payload, worker)
+
+        elif frame.type == BusFrame.DIRECT:
+            # Straight to the recipient's worker. Dropped if they left in the meantime.
+            recipient, _ = framing.unpack_relayed(frame.payload)
+            target = self.usernames.get(bytes(recipient))
+
+            if target is not None and target in self.workers:
+                try:
+                    target.send(BusFrame.DIRECT, frame.sender_id, frame.payload)
+                except OSError:
+                    self._remove(target)
+
+        elif frame.type == BusFrame.CLAIM:
+            username = bytes(frame.payload)
+            accepted = username not in self.usernames
+
+            if accepted:
+                self.usernames[username] = worker
+                self._broadcast(BusFrame.JOINED, frame.sender_id, username, worker)
+
+            worker.send(BusFrame.CLAIM_RESULT, frame.sender_id, bytes((accepted,)))
+
+        elif frame.type == BusFrame.RELEASE:
+            username = bytes(frame.payload)
+
+            if self.usernames.get(username) is worker:
+                del self.usernames[username]
+                self._broadcast(BusFrame.LEFT, frame.sender_id, username, worker)
+
+    def _remove(self, worker: _Worker) -> None:
+        if worker not in self.workers:
+            return
+
+        self.workers.remove(worker)
+
+        worker.close()
+        worker.process.join(1)
+
+        # Everyone connected to that worker is gone with it.
+        for username in [name for name, owner in self.usernames.items() if owner is worker]:
+            del self.usernames[username]
+            self._broadcast(BusFrame.LEFT, 0, username, worker)
+
+        self.logger.warning(f"Worker {worker.index} exited with code {worker.process.exitcode}.")
+
+    def serve_forever(self) -> None:
+        while self.selector.get_map():
+            for key, mask in self.selector.select():
+                worker = key.data
+
+                # Removed earlier in this iteration.
+                if worker not in self.workers:
+                    continue
+
+                try:
+                    if mask & selectors.EVENT_WRITE:
+                        worker.process_writable()
+
+                    if mask & selectors.EVENT_READ:
+                        for frame in worker.frames():
+                            self._handle(worker, frame)
+                except (EOFError, OSError):
+                    self._remove(worker)
+
+    def stop(self) -> None:
+        for worker in self.workers:
+            # Workers started from a terminal got the interrupt as well, the rest is asked to stop here.
+            worker.process.join(1)
+
+            if worker.process.is_alive():
+                os.kill(worker.process.pid, signal.SIGINT)
+                worker.process.join(5)
+
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+            worker.close()
+
+        self.workers.clear()
+        self.selector.close()
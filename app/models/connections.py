@@ -0,0 +1,63 @@
+import socket
+import typing as t
+
+
+# Admitted clients indexed by file descriptor. Descriptors are small, dense integers, so a list does the job of
+# a dict for one pointer per descriptor, and a lookup is an index rather than a hash. Closed sockets report a
+# descriptor of -1 and are never found, even once their number is reused.
+class ConnectionTable:
+    __slots__ = ("_clients", "_count")
+
+    def __init__(self) -> None:
+        self._clients = []
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> t.Iterator[t.Any]:
+        return (client for client in self._clients if client is not None)
+
+    def __contains__(self, sock: socket.socket) -> bool:
+        return self.get(sock) is not None
+
+    def __getitem__(self, sock: socket.socket) -> t.Any:
+        client = self.get(sock)
+        if client is None:
+            raise KeyError(sock)
+
+        return client
+
+    def get(self, sock: t.Optional[socket.socket]) -> t.Optional[t.Any]:
+        if sock is None:
+            return None
+
+        fd = sock.fileno()
+        if 0 <= fd < len(self._clients):
+            return self._clients[fd]
+
+        return None
+
+    def add(self, client: t.Any) -> None:
+        fd = client.socket.fileno()
+
+        # Grown geometrically, a burst of accepts shouldn't copy the table each time.
+        if fd >= len(self._clients):
+            self._clients.extend([None] * max(fd + 1 - len(self._clients), len(self._clients)))
+
+        if self._clients[fd] is None:
+            self._count += 1
+
+        self._clients[fd] = client
+
+    def pop(self, sock: socket.socket) -> t.Any:
+        client = self[sock]
+
+        self._clients[sock.fileno()] = None
+        self._count -= 1
+
+        return client
+
+    def clear(self) -> None:
+        self._clients.clear()
+        self._count = 0
@@ -0,0 +1,154 @@
+import enum
+import socket
+import time
+
+from ..protocol import BinaryDecoder, LegacyDecoder, ReadBuffer, framing
+from ..protocol.framing import Capability, FrameType
+
+# Handshakes only carry a username and a public key, start small and let the buffer grow if needed.
+HANDSHAKE_BUFFER_SIZE = 4 * 1024
+
+
+class HandshakeState(enum.Enum):
+    # Waiting for enough bytes to tell binary (magic) and legacy (ASCII header) clients apart.
+    DETECT = "detect"
+    # Binary client, waiting for its preamble.
+    PREAMBLE = "preamble"
+    # Binary client, preamble answered, waiting for the HELLO frame.
+    HELLO = "hello"
+    # Legacy client, waiting for the username and public key pair.
+    LEGACY = "legacy"
+    # Username and key received and the key is being parsed, or a resumption token received.
+    DONE = "done"
+
+
+# A connection that has been accepted but not admitted yet. Driven by readiness events, every step
+# consumes whatever arrived and returns, so a slow client never holds up the event loop.
+class Handshake:
+    __slots__ = (
+        "socket",
+        "address",
+        "capabilities",
+        "deadline",
+        "started",
+        "state",
+        "read_buffer",
+        "decoder",
+        "protocol",
+        "username",
+        "pub_key_pem",
+        "resume_token",
+    )
+
+    def __init__(
+        self,
+        client_socket: socket.socket,
+        address: tuple,
+        capabilities: Capability,
+        header_length: int,
+        timeout: float
+    ) -> None:
+        self.socket = client_socket
+        self.address = address
+
+        # Capabilities the server offers, narrowed down to what the client asked for.
+        self.capabilities = capabilities
+
+        self.started = time.monotonic()
+        self.deadline = self.started + timeout
+
+        self.state = HandshakeState.DETECT
+        self.read_buffer = ReadBuffer(HANDSHAKE_BUFFER_SIZE)
+        self.decoder = LegacyDecoder(header_length)
+
+        self.protocol = 0
+        self.username = None
+        self.pub_key_pem = None
+
+        # Set instead of the username and key when the client asks to resume an earlier session.
+        self.resume_token = None
+
+    def process(self) -> bool:
+        # Reads what's available, returns True once the username and key (or a resumption token) are in. Raises
+        # `EOFError` if the client hung up and `ProtocolError` if it sent something unexpected.
+        if not self.read_buffer.recv_into(self.socket):
+            raise EOFError("Connection closed during the handshake.")
+
+        if self.state is HandshakeState.DETECT:
+            self._detect()
+
+        if self.state is HandshakeState.PREAMBLE:
+            self._preamble()
+
+        if self.state is HandshakeState.HELLO:
+            self._hello()
+
+        if self.state is HandshakeState.LEGACY:
+            self._legacy()
+
+        return self.state is HandshakeState.DONE
+
+    def _detect(self) -> None:
+        if len(self.read_buffer) < len(framing.MAGIC):
+            return
+
+        if self.read_buffer.peek(len(framing.MAGIC)) == framing.MAGIC:
+            self.state = HandshakeState.PREAMBLE
+        else:
+            self.capabilities = Capability.NONE
+            self.state = HandshakeState.LEGACY
+
+    def _preamble(self) -> None:
+        if len(self.read_buffer) < framing.PREAMBLE.size:
+            return
+
+        preamble = bytes(self.read_buffer.consume(framing.PREAMBLE.size))
+        self.protocol, self.capabilities = framing.negotiate(*framing.decode_preamble(preamble), self.capabilities)
+
+        # A fresh socket has an empty send buffer, the few bytes of the reply always fit.
+        self.socket.send(framing.encode_preamble(self.protocol, self.capabilities))
+
+        self.decoder = BinaryDecoder()
+        self.state = HandshakeState.HELLO
+
+    def _hello(self) -> None:
+        for frame in self.decoder.frames(self.read_buffer):
+            if frame.type == FrameType.RESUME and self.capabilities & Capability.RESUME:
+                if not frame.payload:
+                    raise framing.ProtocolError("Empty resumption token.")
+
+                self.resume_token = bytes(frame.payload)
+                self.state = HandshakeState.DONE
+                return
+
+            if frame.type != FrameType.HELLO:
+                raise framing.ProtocolError(f"Expected a HELLO frame, got frame type {frame.type}.")
+
+            username, pub_key_pem = framing.unpack_hello(frame.payload)
+            self._complete(bytes(username), bytes(pub_key_pem))
+            return
+
+    def _legacy(self) -> None:
+        for username, pub_key_pem in self.decoder.pairs(self.read_buffer):
+            self._complete(username, bytes(pub_key_pem))
+            return
+
+    def _complete(self, username: bytes, pub_key_pem: bytes) -> None:
+        if not username:
+            raise framing.ProtocolError("No username given.")
+
+        # Relayed frames carry the name behind a single length byte, and it's decoded for lookups and logs.
+        if len(username) > framing.MAX_NAME_LENGTH:
+            raise framing.ProtocolError(f"Username longer than {framing.MAX_NAME_LENGTH} bytes.")
+
+        try:
+            username.decode()
+        except UnicodeDecodeError:
+            raise framing.ProtocolError("Username is not valid UTF-8.") from None
+
+        if not pub_key_pem:
+            raise framing.ProtocolError("No key auth found.")
+
+        self.username = username
+        self.pub_key_pem = pub_key_pem
+        self.state = HandshakeState.DONE
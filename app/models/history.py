@@ -0,0 +1,188 @@
+import collections
+import mmap
+import os
+import struct
+import typing as t
+
+# Sequence number, channel name length, frame length. A zeroed header marks the end of the written part.
+RECORD_HEADER = struct.Struct("!QBI")
+
+SEGMENT_SUFFIX = ".log"
+
+
+class Segment:
+    __slots__ = ("number", "path", "size", "end", "_fd", "_map")
+
+    def __init__(self, directory: str, number: int, size: int) -> None:
+        self.number = number
+        self.path = os.path.join(directory, f"{number:020d}{SEGMENT_SUFFIX}")
+
+        # Segments are allocated at full size up front (sparse), so they can be mapped once and appended in place.
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+
+        self.size = os.fstat(self._fd).st_size
+        self._map = mmap.mmap(self._fd, self.size)
+
+        # Offset the next record is written at.
+        self.end = 0
+
+    def append(self, sequence: int, channel: bytes, parts: t.Tuple[bytes, ...]) -> t.Optional[int]:
+        # Returns the offset of the frame, written from its parts, or None if the segment is full.
+        start = self.end + RECORD_HEADER.size
+        offset = start + len(channel)
+        end = offset + sum(len(part) for part in parts)
+
+        if end + RECORD_HEADER.size > self.size:
+            return
+
+        # Body first, a record only counts once its header is in place.
+        self._map[start:offset] = channel
+
+        position = offset
+        for part in parts:
+            self._map[position:position + len(part)] = part
+            position += len(part)
+
+        RECORD_HEADER.pack_into(self._map, self.end, sequence, len(channel), end - offset)
+
+        self.end = end
+        return offset
+
+    def records(self) -> t.Iterator[t.Tuple[int, str, int, int]]:
+        # Scans the segment from the start, yielding `(sequence, channel, offset, length)` per record.
+        position = 0
+
+        while position + RECORD_HEADER.size <= self.size:
+            sequence, channel_length, length = RECORD_HEADER.unpack_from(self._map, position)
+            offset = position + RECORD_HEADER.size + channel_length
+
+            if not sequence or offset + length > self.size:
+                break
+
+            channel = self._map[position + RECORD_HEADER.size:offset].decode("utf-8", "replace")
+            yield sequence, channel, offset, length
+
+            position = offset + length
+
+        self.end = position
+
+    def view(self, offset: int, length: int) -> memoryview:
+        # Points straight into the mapping, no copy is made until the kernel sends it.
+        return memoryview(self._map)[offset:offset + length]
+
+    def close(self) -> None:
+        try:
+            self._map.close()
+        except BufferError:
+            # Views are still queued for sending, the mapping goes away with the last of them.
+            pass
+
+        os.close(self._fd)
+
+    def remove(self) -> None:
+        self.close()
+        os.remove(self.path)
+
+
+class History:
+    __slots__ = ("directory", "segment_size", "max_segments", "index_limit", "segments", "channels", "sequence")
+
+    def __init__(self, directory: str, segment_size: int, max_segments: int, index_limit: int) -> None:
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_segments = max(max_segments, 1)
+
+        # Channel -> `(sequence, segment, offset, length)` of its most recent records, oldest first.
+        self.index_limit = index_limit
+        self.channels = collections.defaultdict(lambda: collections.deque(maxlen=self.index_limit))
+
+        self.segments = collections.deque()
+        self.sequence = 0
+
+    def open(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+
+        numbers = sorted(
+            int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.directory)
+            if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit()
+        )
+
+        # Rebuild the index from what survived the last run.
+        for number in numbers:
+            segment = Segment(self.directory, number, self.segment_size)
+            self.segments.append(segment)
+
+            for sequence, channel, offset, length in segment.records():
+                self.channels[channel].append((sequence, segment, offset, length))
+                self.sequence = max(self.sequence, sequence)
+
+        if not self.segments:
+            self.segments.append(Segment(self.directory, 0, self.segment_size))
+
+        self._apply_retention()
+
+    def append(self, channel: str, *parts: bytes) -> t.Optional[int]:
+        channel_bytes = channel.encode()
+        segment = self.segments[-1]
+
+        offset = segment.append(self.sequence + 1, channel_bytes, parts)
+        if offset is None:
+            segment = self._rotate()
+            offset = segment.append(self.sequence + 1, channel_bytes, parts)
+
+            # Larger than a whole segment, not worth keeping.
+            if offset is None:
+                return
+
+        self.sequence += 1
+        self.channels[channel].append((self.sequence, segment, offset, sum(len(part) for part in parts)))
+
+        return self.sequence
+
+    def latest(self, channel: str, count: int) -> t.List[t.Tuple[int, memoryview]]:
+        records = self.channels.get(channel)
+        if not records or count <= 0:
+            return []
+
+        start = max(len(records) - count, 0)
+        return [
+            (sequence, segment.view(offset, length))
+            for sequence, segment, offset, length in (records[index] for index in range(start, len(records)))
+        ]
+
+    def since(self, channel: str, sequence: int) -> t.List[t.Tuple[int, memoryview]]:
+        records = self.channels.get(channel)
+        if not records:
+            return []
+
+        return [
+            (record_sequence, segment.view(offset, length))
+            for record_sequence, segment, offset, length in records if record_sequence > sequence
+        ]
+
+    def _rotate(self) -> Segment:
+        segment = Segment(self.directory, self.segments[-1].number + 1, self.segment_size)
+        self.segments.append(segment)
+
+        self._apply_retention()
+        return segment
+
+    def _apply_retention(self) -> None:
+        # Disk use stays under `max_segments * segment_size`, the index forgets what lived in dropped segments.
+        while len(self.segments) > self.max_segments:
+            removed = self.segments.popleft()
+
+            for records in self.channels.values():
+                while records and records[0][1] is removed:
+                    records.popleft()
+
+            removed.remove()
+
+    def close(self) -> None:
+        for segment in self.segments:
+            segment.close()
+
+        self.segments.clear()
+        self.channels.clear()
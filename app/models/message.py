@@ -2,9 +2,12 @@ import typing as t
 
 
 class Message:
+    __slots__ = ("header", "data")
+
     def __init__(self, header: t.Optional[bytes], data: bytes) -> None:
         self.header = header
         self.data = data
 
     def __str__(self) -> str:
-        return self.data.decode()
+        # Signed by the sender, not checked as text. Invalid bytes must not take the server down when logged.
+        return str(self.data, "utf-8", "replace")
@@ -0,0 +1,69 @@
+import collections
+import os
+import time
+import typing as t
+
+from rsa.key import PublicKey
+
+from ..encryption.session import Session
+
+TOKEN_SIZE = 16
+
+
+class ResumeState:
+    __slots__ = ("raw_username", "public_key", "session", "channel", "sequence", "expires")
+
+    def __init__(self, raw_username: bytes, public_key: PublicKey, session: t.Optional[Session]) -> None:
+        self.raw_username = raw_username
+        self.public_key = public_key
+        self.session = session
+
+        # Filled in on disconnect: the channel to rejoin, the last history sequence the client could have seen,
+        # and when the token stops being accepted. Tokens of connected clients only go away through eviction.
+        self.channel = None
+        self.sequence = None
+        self.expires = None
+
+
+# Bounded LRU of what a returning client would otherwise have to send and the server parse again, keyed by
+# single-use tokens. Kept in memory, so tokens don't survive a restart and are only known to the issuing worker.
+class ResumptionCache:
+    __slots__ = ("capacity", "ttl", "_states")
+
+    def __init__(self, capacity: int, ttl: float) -> None:
+        self.capacity = capacity
+        self.ttl = ttl
+        self._states = collections.OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def issue(self, state: ResumeState) -> bytes:
+        token = os.urandom(TOKEN_SIZE)
+        self._states[token] = state
+
+        while len(self._states) > self.capacity:
+            self._states.popitem(last=False)
+
+        return token
+
+    def suspend(self, token: bytes, channel: t.Optional[str], sequence: t.Optional[int]) -> None:
+        # The client went away, its token is good for `ttl` seconds from now.
+        state = self._states.get(token)
+        if state is None:
+            return
+
+        state.channel = channel
+        state.sequence = sequence
+        state.expires = time.monotonic() + self.ttl
+
+        self._states.move_to_end(token)
+
+    def claim(self, token: bytes) -> t.Optional[ResumeState]:
+        # Tokens are single use, a resumed client is handed a fresh one.
+        state = self._states.pop(token, None)
+
+        if state is None or (state.expires is not None and state.expires <= time.monotonic()):
+            return None
+
+        return state
@@ -1,35 +1,200 @@
+import collections
+import itertools
 import os
+import selectors
+import signal
 import socket
 import sys
 import time
 import typing as t
 
-import rsa
-
+from .admin import AdminServer
+from .capture import CaptureEvent, CaptureWriter, capture_path
+from .channels import ChannelIndex
+from .cluster import BusFrame, ClusterLink, RemoteClient, pack_relay, unpack_relay
+from .connections import ConnectionTable
+from .handshake import Handshake
+from .history import History
 from .message import Message
+from .resumption import ResumeState, ResumptionCache
 from .server_side_client import Client
-from ..config import HEADER_LENGTH, MOTD
+from ..config import (
+    ADMIN_PORT,
+    CAPTURE_DIRECTORY,
+    CAPTURE_MAX_SIZE,
+    COALESCE_BYTES,
+    COALESCE_WINDOW,
+    COMPRESSION,
+    COMPRESSION_THRESHOLD,
+    DEFAULT_CHANNEL,
+    HANDSHAKE_TIMEOUT,
+    HEADER_LENGTH,
+    HISTORY_DIRECTORY,
+    HISTORY_INDEX_LIMIT,
+    HISTORY_MAX_SEGMENTS,
+    HISTORY_REPLAY,
+    HISTORY_SEGMENT_SIZE,
+    IDLE_TIMEOUT,
+    LOG_FILE,
+    LOG_FORMAT,
+    LOG_LEVEL,
+    LOG_OVERFLOW_POLICY,
+    LOG_QUEUE_SIZE,
+    LOG_SAMPLE_RATE,
+    MAX_PENDING_HANDSHAKES,
+    MOTD,
+    PING_INTERVAL,
+    PROFILE_DIRECTORY,
+    PROFILE_DURATION,
+    PROFILE_INTERVAL,
+    PROFILE_TOP,
+    RESUME_CACHE_SIZE,
+    RESUME_TTL,
+    SESSION_MAC,
+    SLOW_ITERATION,
+    TCP_NODELAY,
+    VERIFY_WORKERS,
+)
+from ..encryption.rsa import RSA
+from ..encryption.session import Session
+from ..encryption.verification import KeyLoad, Verification, VerificationPool
 from ..mixins.logging import LoggingMixin
-from ..utils import get_color, on_startup
+from ..protocol import SlowConsumerError, encode_compressed_frame, framing
+from ..protocol.framing import Capability, FrameType
+from ..utils import (
+    Logger,
+    Metrics,
+    QueuedLogger,
+    SamplingProfiler,
+    TimerWheel,
+    get_color,
+    on_startup,
+    raise_file_limit,
+)
+
+# Connections accepted per readiness event on the listening socket.
+ACCEPT_BATCH = 64
+
+PING_FRAME = framing.encode_frame(FrameType.PING, 0)
 
 
 class Server(LoggingMixin):
     __slots__ = (
-        "sockets_list",
+        "selector",
         "clients",
+        "client_ids",
+        "channels",
+        "commands",
+        "verifier",
+        "capabilities",
+        "cluster",
+        "usernames",
+        "remote_users",
+        "pending_claims",
+        "handshakes",
+        "handshake_deadlines",
+        "accepting",
+        "coalesced",
+        "coalesce_deadline",
+        "timers",
         "host",
         "port",
         "socket",
         "start_timer",
         "startup_duration",
+        "first_accept_duration",
         "backlog",
-        "motd"
+        "motd",
+        "metrics",
+        "admin",
+        "history",
+        "capture",
+        "profiler",
+        "signal_sockets",
+        "resumption"
     )
 
-    def __init__(self, address: tuple, backlog: t.Optional[int] = None) -> None:
-        # List of sockets and clients
-        self.sockets_list = []
-        self.clients = {}
+    def __init__(
+        self,
+        address: tuple,
+        backlog: t.Optional[int] = None,
+        cluster: t.Optional[ClusterLink] = None
+    ) -> None:
+        # Readiness selector (epoll/kqueue where available) and admitted clients by file descriptor.
+        self.selector = selectors.DefaultSelector()
+        self.clients = ConnectionTable()
+
+        # Bus to the other workers when running sharded, None for a single process.
+        self.cluster = cluster
+
+        # Username -> client for everyone connected (or being admitted) here, and usernames on other workers.
+        self.usernames = {}
+        self.remote_users = set()
+
+        # Clients waiting for the hub to confirm their username, by client id.
+        self.pending_claims = {}
+
+        # Connections still in their handshake by socket, and the same handshakes in deadline order.
+        self.handshakes = {}
+        self.handshake_deadlines = collections.deque()
+
+        # Whether the listening socket is watched, it's paused while too many handshakes are pending.
+        self.accepting = False
+
+        # Clients with broadcast frames held back for a combined write, by socket, and when they're due.
+        self.coalesced = {}
+        self.coalesce_deadline = None
+
+        # Per-client idle checks. Activity only stamps the client, the timer looks at the stamp when it fires.
+        self.timers = TimerWheel()
+
+        # Sender ids handed out to binary protocol clients.
+        self.client_ids = cluster.client_ids() if cluster else itertools.count(1)
+
+        # Channel -> members index, messages only fan out to the sender's channel.
+        self.channels = ChannelIndex(DEFAULT_CHANNEL)
+
+        # Signature checks run on worker processes, results come back through the selector.
+        self.verifier = VerificationPool(VERIFY_WORKERS // cluster.count if cluster else VERIFY_WORKERS)
+
+        # Broadcast frames kept on disk and replayed to clients joining a channel. Workers keep their own copy.
+        self.history = None
+        if HISTORY_DIRECTORY:
+            directory = os.path.join(HISTORY_DIRECTORY, f"worker-{cluster.index}") if cluster else HISTORY_DIRECTORY
+            self.history = History(directory, HISTORY_SEGMENT_SIZE, HISTORY_MAX_SEGMENTS, HISTORY_INDEX_LIMIT)
+
+        # Inbound traffic recorded for replays, when enabled. Workers record their own connections.
+        self.capture = None
+        if CAPTURE_DIRECTORY:
+            self.capture = CaptureWriter(
+                capture_path(CAPTURE_DIRECTORY, cluster.index if cluster else None), CAPTURE_MAX_SIZE
+            )
+
+        # Sessions of connected and recently disconnected clients, resumable with the token they were handed.
+        self.resumption = ResumptionCache(RESUME_CACHE_SIZE, RESUME_TTL) if RESUME_CACHE_SIZE > 0 else None
+
+        # Optional protocol features this server is willing to negotiate.
+        self.capabilities = framing.enabled_capabilities(
+            SESSION_MAC, COMPRESSION, PING_INTERVAL > 0, self.resumption is not None
+        )
+
+        # Chat commands, `/<name> <arguments>`.
+        self.commands = {
+            "join": self.command_join,
+            "leave": self.command_leave,
+            "list": self.command_list,
+            "who": self.command_who,
+            "history": self.command_history,
+            "msg": self.command_msg,
+        }
+
+        # Counters and per-stage latencies, served in Prometheus format by the admin endpoint.
+        self.metrics = self.create_metrics()
+        self.admin = None
+
+        # Samples the loop on demand. Signals only wake the loop up through the socket pair, and are handled there.
+        self.profiler = SamplingProfiler(PROFILE_INTERVAL, PROFILE_TOP)
+        self.signal_sockets = None
 
         # Address to run the server on
         self.host, self.port = address
@@ -40,9 +205,14 @@ class Server(LoggingMixin):
             # REUSE_ADDR works differently on windows
             self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 
-        # Initialize startup timer and calculate duration
+        if cluster is not None:
+            # Every worker binds the same port, the kernel spreads new connections over them.
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
+        # Initialize startup timer and calculate duration, and how long it took until a client got in.
         self.start_timer = time.perf_counter()
         self.startup_duration = None
+        self.first_accept_duration = None
 
         # Get the backlog (Max number of connections at a time)
         self.backlog = backlog
@@ -64,7 +234,9 @@ class Server(LoggingMixin):
             end = time.perf_counter()
             duration = round((end - self.start_timer) * 1000, 2)
 
-            on_startup("Server", duration, self.host, self.port)
+            # Sharded workers leave the banner to the hub.
+            if self.cluster is None:
+                on_startup("Server", duration, self.host, self.port)
 
             # Listening backlog
             if not self.backlog:
@@ -75,111 +247,1100 @@ class Server(LoggingMixin):
             # Set socket to non-blocking
             self.socket.setblocking(False)
 
-            # Add socket to the list of sockets.
-            self.sockets_list.append(self.socket)
+            # Allow holding as many idle connections as the system permits.
+            raise_file_limit()
+
+            if self.history is not None:
+                self.history.open()
+
+            if self.capture is not None:
+                self.capture.open()
+                self.logger.info(f"Capturing inbound traffic to {self.capture.path}.")
+
+            # Watch the listening socket for incoming connections, and the verifier for finished checks.
+            self.selector.register(self.socket, selectors.EVENT_READ, self.process_connection)
+            self.accepting = True
+            self.selector.register(self.verifier.wakeup_socket, selectors.EVENT_READ, self.process_verified)
+
+            if self.cluster is not None:
+                self.cluster.attach(self.selector, self.process_bus)
+
+            if hasattr(signal, "SIGUSR1"):
+                self.watch_signals()
+
+            if ADMIN_PORT is not None:
+                self.start_admin(ADMIN_PORT + (self.cluster.index if self.cluster else 0))
+
+            if self.cluster is not None:
+                self.logger.success(f"Worker {self.cluster.index} started. Listening for connections.")
+            else:
+                self.logger.success("Server started. Listening for connections.")
+
+    def create_logger(self) -> Logger:
+        # Logging goes through a writer thread, a slow terminal must not stall the event loop.
+        return QueuedLogger(
+            LOG_LEVEL,
+            LOG_FORMAT,
+            open(LOG_FILE, "a", encoding="utf-8") if LOG_FILE else None,
+            LOG_QUEUE_SIZE,
+            LOG_OVERFLOW_POLICY,
+            LOG_SAMPLE_RATE,
+        )
+
+    def create_metrics(self) -> Metrics:
+        metrics = Metrics()
+
+        metrics.counter("connections_accepted", "Connections admitted after the handshake.")
+        metrics.counter("connections_failed", "Connections that failed or were refused during the handshake.")
+        metrics.counter("disconnects", "Admitted connections that were closed.")
+        metrics.counter("frames_in", "Messages read from clients.")
+        metrics.counter("frames_out", "Frames queued for clients.")
+        metrics.counter("bytes_in", "Bytes read from clients.")
+        metrics.counter("bytes_out", "Bytes written to clients.")
+        metrics.counter("coalesced_writes", "Combined writes of held back broadcast frames.")
+        metrics.counter("verify_failures", "Messages that failed signature or HMAC verification.")
+        metrics.counter("protocol_errors", "Connections closed for sending malformed frames.")
+        metrics.counter("dropped_sends", "Frames discarded by slow consumer policies.")
+        metrics.counter("slow_consumer_disconnects", "Clients disconnected for not keeping up.")
+        metrics.counter("idle_disconnects", "Clients disconnected after going silent for too long.")
+        metrics.counter("resumed_sessions", "Connections admitted with a resumption token.")
+        metrics.counter("resume_misses", "Resumption tokens that were unknown or expired.")
+        metrics.counter("direct_messages", "Private messages sent with /msg.")
+        metrics.counter("slow_iterations", "Loop iterations that took longer than SLOW_ITERATION.")
+
+        metrics.gauge("connections", "Clients currently connected.", lambda: len(self.clients))
+        metrics.gauge(
+            "pending_verifications",
+            "Messages waiting for their verification result.",
+            lambda: sum(len(client.pending_verifications or ()) for client in self.clients)
+        )
+        metrics.gauge(
+            "resumable_sessions",
+            "Sessions kept for resumption.",
+            lambda: len(self.resumption) if self.resumption is not None else 0
+        )
+        metrics.gauge("log_queue", "Log records waiting for the writer thread.", lambda: self.logger.backlog)
+        metrics.gauge("log_dropped", "Log records dropped by the overflow policy.", lambda: self.logger.dropped)
+
+        return metrics
+
+    def start_admin(self, port: int) -> None:
+        # Localhost only, nothing here is meant to be reachable from outside.
+        self.admin = AdminServer(
+            ("127.0.0.1", port), {"/metrics": lambda _query: self.metrics.render(), "/profile": self.admin_profile}
+        )
+
+        try:
+            self.admin.attach(self.selector)
+        except OSError as exc:
+            self.logger.warning(f"Admin endpoint could not be started on port {port}. Error: {exc}")
+            self.admin.close()
+            self.admin = None
+
+    def watch_signals(self) -> None:
+        # The handler does nothing, the signal number written to the wakeup socket is what the loop acts on.
+        self.signal_sockets = socket.socketpair()
+
+        for signal_socket in self.signal_sockets:
+            signal_socket.setblocking(False)
+
+        signal.set_wakeup_fd(self.signal_sockets[1].fileno())
+        signal.signal(signal.SIGUSR1, lambda _signum, _frame: None)
+
+        self.selector.register(self.signal_sockets[0], selectors.EVENT_READ, self.process_signals)
+
+    def process_signals(self, signal_socket: socket.socket, _mask: int) -> None:
+        try:
+            received = signal_socket.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+
+        if signal.SIGUSR1 in received:
+            self.start_profile(PROFILE_DURATION)
+
+        # The profiler's timer wakes the loop up as well, the last tick finishes the profile.
+        summary = self.profiler.finish()
+        if summary is not None:
+            self.logger.info(summary)
+
+    def start_profile(self, duration: float) -> str:
+        if self.signal_sockets is None or not self.profiler.supported():
+            return "Profiling is not supported on this platform."
 
-            self.logger.success("Server started. Listening for connections.")
+        name = time.strftime("%Y%m%d-%H%M%S")
+        if self.cluster is not None:
+            name += f"-worker-{self.cluster.index}"
+
+        path = os.path.join(PROFILE_DIRECTORY, f"{name}.folded")
+
+        if not self.profiler.start(duration, path):
+            return "A profile is already being taken."
+
+        message = f"Profiling the event loop for {duration:g}s."
+        self.logger.info(message)
+
+        return message
+
+    def admin_profile(self, query: t.Dict[str, str]) -> str:
+        try:
+            duration = float(query.get("seconds", PROFILE_DURATION))
+        except ValueError:
+            duration = 0
+
+        if duration <= 0:
+            return "Usage: /profile?seconds=<duration>\n"
+
+        return self.start_profile(duration) + "\n"
 
     def disconnect(self) -> None:
-        for current_socket in self.sockets_list:
-            current_socket.close()
+        for client in self.clients:
+            client.socket.close()
+
+        self.clients.clear()
+
+        for client in self.pending_claims.values():
+            client.socket.close()
+
+        self.pending_claims.clear()
+
+        for client_socket in self.handshakes:
+            client_socket.close()
+
+        self.handshakes.clear()
+        self.handshake_deadlines.clear()
+
+        self.verifier.close()
+
+        if self.admin is not None:
+            self.admin.close()
+
+        if self.history is not None:
+            self.history.close()
+
+        if self.capture is not None:
+            self.capture.close()
+
+        if self.signal_sockets is not None:
+            self.profiler.cancel()
+            signal.set_wakeup_fd(-1)
+
+            for signal_socket in self.signal_sockets:
+                signal_socket.close()
+
+        if self.cluster is not None:
+            self.cluster.close()
+
+        self.selector.close()
+        self.socket.close()
+
+    def serve_forever(self) -> None:
+        while True:
+            # Wake up in time for the oldest handshake's deadline, held back writes and the next timer tick.
+            timeout = self.timers.timeout()
+            for deadline in (
+                self.handshake_deadlines[0].deadline if self.handshake_deadlines else None,
+                self.coalesce_deadline,
+            ):
+                if deadline is not None:
+                    remaining = max(deadline - time.monotonic(), 0)
+                    timeout = remaining if timeout is None else min(timeout, remaining)
+
+            # Only sockets with pending events are returned, idle connections cost nothing here.
+            events = self.selector.select(timeout)
+            started = time.perf_counter()
+
+            for key, mask in events:
+                callback = key.data
+
+                try:
+                    callback(key.fileobj, mask)
+                except OSError as exc:
+                    if key.fileobj is self.socket:
+                        self.logger.error(f"Failed to accept connection. Error: {exc}")
+                    else:
+                        self.remove_errored_sockets([key.fileobj])
+
+            self.expire_handshakes()
+            self.timers.advance()
+
+            if self.coalesce_deadline is not None and time.monotonic() >= self.coalesce_deadline:
+                self.flush_coalesced()
+
+            # Everything read this iteration goes to the verifier as one batch.
+            self.verifier.flush()
+
+            # Whatever held up the loop delayed every client, not just the ones with events.
+            if SLOW_ITERATION > 0:
+                elapsed = time.perf_counter() - started
+
+                if elapsed > SLOW_ITERATION:
+                    self.metrics.inc("slow_iterations")
+                    self.logger.warning(f"Slow loop iteration: {elapsed * 1000:.1f}ms for {len(events)} events.")
 
     def remove_specified_socket(self, sock: socket.socket) -> None:
-        self.sockets_list.remove(sock)
-        del self.clients[sock]
+        if sock not in self.clients:
+            return
+
+        self.selector.unregister(sock)
+
+        client = self.clients.pop(sock)
+
+        # The session stays resumable for a while, from where the client left off.
+        if client.resume_token is not None and self.resumption is not None:
+            self.resumption.suspend(
+                client.resume_token, client.channel, self.history.sequence if self.history is not None else None
+            )
+
+        self.channels.leave(client)
+        self.coalesced.pop(sock, None)
+
+        if client.idle_timer is not None:
+            client.idle_timer.cancel()
+
+        self.metrics.inc("disconnects")
+        self.release_username(client)
+
+        if self.capture is not None:
+            self.record(CaptureEvent.CLOSE, client)
+
+        sock.close()
+
+    def release_username(self, client: Client) -> None:
+        if self.usernames.get(client.username) is not client:
+            return
+
+        del self.usernames[client.username]
+
+        if self.cluster is not None:
+            self.cluster.send(BusFrame.RELEASE, client.client_id, client.raw_username)
 
     def remove_errored_sockets(self, errored_sockets: list) -> None:
         for current_socket in errored_sockets:
-            client = self.clients[current_socket]
+            client = self.clients.get(current_socket)
+            if client is None:
+                continue
+
             self.logger.warning(
                 f"{get_color('YELLOW')}Exception occurred. Location: {client.username} [{client.address}]"
             )
 
             self.remove_specified_socket(current_socket)
 
-    def receive_message(self, client_socket: socket.socket) -> t.Optional[Message]:
+    def record(self, event: CaptureEvent, client: Client, payload: t.Union[bytes, memoryview] = b"") -> None:
+        self.capture.record(event, client.socket.fileno(), payload)
+
+        if not self.capture.active:
+            self.logger.warning(f"Capture {self.capture.path} reached its size limit, no longer recording.")
+            self.capture = None
+
+    def process_connection(self, server_socket: socket.socket, _mask: int = selectors.EVENT_READ) -> None:
+        # Drain the accept queue in one go, a reconnect storm shouldn't take one loop iteration per client.
+        for _ in range(ACCEPT_BATCH):
+            if len(self.handshakes) >= MAX_PENDING_HANDSHAKES:
+                self.pause_accepting()
+                return
+
+            try:
+                client_socket, address = server_socket.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+
+            client_socket.setblocking(False)
+            if TCP_NODELAY:
+                client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            handshake = Handshake(client_socket, address, self.capabilities, HEADER_LENGTH, HANDSHAKE_TIMEOUT)
+            self.handshakes[client_socket] = handshake
+            self.handshake_deadlines.append(handshake)
+
+            self.selector.register(client_socket, selectors.EVENT_READ, self.process_handshake)
+
+    def pause_accepting(self) -> None:
+        # New connections wait in the kernel's backlog until enough pending handshakes are done.
+        if self.accepting:
+            self.selector.unregister(self.socket)
+            self.accepting = False
+
+    def resume_accepting(self) -> None:
+        if not self.accepting and len(self.handshakes) < MAX_PENDING_HANDSHAKES:
+            self.selector.register(self.socket, selectors.EVENT_READ, self.process_connection)
+            self.accepting = True
+
+    def process_handshake(self, client_socket: socket.socket, _mask: int) -> None:
+        handshake = self.handshakes[client_socket]
+
         try:
-            message_header = client_socket.recv(HEADER_LENGTH)
-            if not len(message_header):
+            if not handshake.process():
                 return
+        except (BlockingIOError, InterruptedError):
+            return
+        except (EOFError, framing.ProtocolError, OSError) as exc:
+            self.fail_handshake(handshake, str(exc))
+            return
+
+        # Nothing more is expected from the client until it is welcomed. The client gets a buffer of its own, so
+        # anything sent ahead would be lost rather than read as messages.
+        if len(handshake.read_buffer):
+            self.fail_handshake(handshake, "Data sent before the handshake finished.")
+            return
+
+        handshake.read_buffer.release()
+        self.selector.unregister(client_socket)
+
+        if handshake.resume_token is not None:
+            del self.handshakes[client_socket]
+            self.resume_accepting()
+
+            self.resume_session(handshake)
+            return
 
-            message_length = int(message_header.decode().strip())
+        # Still pending while the key is parsed off the loop, so it counts towards the limit and the deadline.
+        job = KeyLoad(handshake, handshake.pub_key_pem)
+        self.verifier.load_key(job)
 
-            return Message(message_header, client_socket.recv(message_length))
-        except Exception as exc:
-            self.logger.error(f"Exception occurred: {exc}")
+        if job.done:
+            self.finish_handshake(job)
 
-    def process_connection(self) -> None:
-        client_socket, address = self.socket.accept()
+    def fail_handshake(self, handshake: Handshake, reason: str) -> None:
+        address = handshake.address
+        self.logger.error(f"New connection failed from {address[0]}:{address[1]}. Error: {reason}")
+        self.metrics.inc("connections_failed")
 
-        username = self.receive_message(client_socket)
-        pub_key = self.receive_message(client_socket)
+        if self.handshakes.pop(handshake.socket, None) is not None:
+            # Handshakes waiting for their key aren't watched anymore.
+            if handshake.socket in self.selector.get_map():
+                self.selector.unregister(handshake.socket)
 
-        client = Client(client_socket, address, username, pub_key)
+            self.resume_accepting()
 
-        if not username:
-            self.logger.error(f"New connection failed from {client.address}.")
+        handshake.socket.close()
+
+    def expire_handshakes(self) -> None:
+        # Deadlines are handed out in accept order, so expired handshakes are always at the front.
+        deadlines = self.handshake_deadlines
+        now = time.monotonic()
+
+        while deadlines and deadlines[0].deadline <= now:
+            handshake = deadlines.popleft()
+
+            if self.handshakes.get(handshake.socket) is handshake:
+                self.fail_handshake(handshake, "Handshake timed out.")
+
+    def finish_handshake(self, job: KeyLoad) -> None:
+        handshake = job.handshake
+
+        # Timed out while its key was being parsed.
+        if self.handshakes.pop(handshake.socket, None) is not handshake:
             return
 
-        if not pub_key:
-            self.logger.error(f"New connection failed from {client.address}. No key auth found. {pub_key}")
+        self.resume_accepting()
+
+        if job.public_key is None:
+            self.fail_handshake(handshake, "Invalid public key.")
             return
 
-        self.sockets_list.append(client_socket)
-        self.clients[client_socket] = client
+        client = Client(
+            handshake.socket,
+            handshake.address,
+            handshake.username,
+            job.public_key,
+            next(self.client_ids),
+            handshake.protocol,
+        )
+
+        if handshake.capabilities & Capability.SESSION_MAC:
+            client.session = Session.generate()
+
+        if handshake.capabilities & Capability.COMPRESSION:
+            client.enable_compression()
+
+        client.heartbeat = bool(handshake.capabilities & Capability.HEARTBEAT)
+
+        client.resumable = bool(handshake.capabilities & Capability.RESUME)
+
+        self.metrics.observe("handshake", time.monotonic() - handshake.started)
+        self.admit_client(client)
+
+    def resume_session(self, handshake: Handshake) -> None:
+        # The key was parsed when the session started, nothing expensive is left to do.
+        state = self.resumption.claim(handshake.resume_token)
+
+        if state is None:
+            self.metrics.inc("resume_misses")
+
+            # The client starts over with a full handshake.
+            try:
+                handshake.socket.send(
+                    framing.encode_frame(FrameType.ERROR, 0, b"Unknown or expired resumption token.")
+                )
+            except OSError:
+                pass
+
+            self.fail_handshake(handshake, "Unknown or expired resumption token.")
+            return
+
+        client = Client(
+            handshake.socket,
+            handshake.address,
+            state.raw_username,
+            state.public_key,
+            next(self.client_ids),
+            handshake.protocol,
+        )
+
+        # Picks up the HMAC sequence where it left off, so frames from the old connection can't be replayed.
+        if handshake.capabilities & Capability.SESSION_MAC:
+            client.session = state.session or Session.generate()
+
+        if handshake.capabilities & Capability.COMPRESSION:
+            client.enable_compression()
+
+        client.heartbeat = bool(handshake.capabilities & Capability.HEARTBEAT)
+        client.resumable = True
+        client.resumed = state
+
+        # A flaky link may come back before the old connection was noticed to be dead.
+        previous = self.usernames.get(client.username)
+        if isinstance(previous, Client) and previous.resume_token == handshake.resume_token:
+            self.logger.info(f"{client.username} [{previous.address}] replaced by a resumed connection.")
+
+            state.channel = previous.channel
+            state.sequence = self.history.sequence if self.history is not None else None
+            self.remove_specified_socket(previous.socket)
+
+        self.metrics.inc("resumed_sessions")
+        self.metrics.observe("handshake", time.monotonic() - handshake.started)
+        self.admit_client(client)
+
+    def admit_client(self, client: Client) -> None:
+        # Usernames are unique, across every worker when sharded.
+        if client.username in self.usernames or client.username in self.remote_users:
+            self.reject_client(client, f"The username {client.username} is already taken.")
+            return
+
+        self.usernames[client.username] = client
+
+        if self.cluster is None:
+            self.accept_client(client)
+            return
+
+        # Held back until the hub confirms the username is free cluster-wide, for as long as a handshake may take.
+        self.pending_claims[client.client_id] = client
+        self.cluster.send(BusFrame.CLAIM, client.client_id, client.raw_username)
+
+        self.timers.schedule(HANDSHAKE_TIMEOUT, self.expire_claim, client)
+
+    def expire_claim(self, client: Client) -> None:
+        if self.pending_claims.get(client.client_id) is not client:
+            return
+
+        del self.pending_claims[client.client_id]
+        self.reject_client(client, "The cluster did not answer in time.")
+
+        # The hub may still grant the claim later, the release follows it on the bus and gives the name back.
+        try:
+            self.cluster.send(BusFrame.RELEASE, client.client_id, client.raw_username)
+        except OSError:
+            pass
+
+    def reject_client(self, client: Client, reason: str) -> None:
+        self.logger.error(f"New connection refused from {client.address}. {reason}")
+        self.metrics.inc("connections_failed")
+
+        reason = reason.encode()
+
+        # Legacy clients only expect the MOTD at this point, they'll show the reason in its place.
+        try:
+            if client.is_legacy:
+                client.socket.send(client.get_header(reason) + reason)
+            else:
+                client.socket.send(framing.encode_frame(FrameType.ERROR, 0, reason))
+        except OSError:
+            pass
+
+        if self.usernames.get(client.username) is client:
+            del self.usernames[client.username]
+
+        client.socket.close()
+
+    def accept_client(self, client: Client) -> None:
+        client_socket = client.socket
+
+        resumed = client.resumed
+        channel = resumed.channel if resumed is not None and resumed.channel else self.channels.default
+
+        self.clients.add(client)
+        self.channels.join(client, channel)
+        self.metrics.inc("connections_accepted")
+
+        if self.capture is not None:
+            self.record(CaptureEvent.CONNECT, client, bytes((client.protocol,)) + client.raw_username)
+
+        if PING_INTERVAL > 0:
+            self.watch_idle(client)
+        self.selector.register(client_socket, selectors.EVENT_READ, self.process_events)
 
         # Log successful connection
         self.logger.success(
             f"{get_color('GREEN')}Accepted new connection requested by {client.username} [{client.address}]."
         )
 
-        # Send the data to Client
-        motd = self.motd.encode()
-        motd_header = client.get_header(motd)
+        if self.first_accept_duration is None:
+            self.first_accept_duration = round((time.perf_counter() - self.start_timer) * 1000, 2)
+            self.logger.info(f"First connection accepted {self.first_accept_duration}ms after start.")
+
+        # Send the data to Client, a resumed client has seen the MOTD already.
+        motd = self.motd.encode() if resumed is None else b""
 
         # Sent the MOTD
-        client.socket.send(motd_header + motd)
+        if client.is_legacy:
+            welcome = client.get_header(motd) + motd
+        else:
+            welcome = framing.encode_frame(FrameType.WELCOME, client.client_id, motd)
 
-    def broadcast_message(self, sock: socket.socket, client: Client, message: Message) -> None:
-        for client_socket in self.clients:
-            if client_socket != sock:
-                sender_information = client.username_header + client.raw_username
-                message_to_send = message.header + message.data
+        # Tokens are encrypted like the session secret, so they can't be lifted off the wire.
+        if client.resumable and self.resumption is not None:
+            client.resume_token = self.resumption.issue(
+                ResumeState(client.raw_username, client.pub_key, client.session)
+            )
+            welcome = framing.encode_frame(
+                FrameType.RESUME, client.client_id, RSA.encrypt(client.resume_token, client.pub_key)
+            ) + welcome
 
-                client_socket.send(sender_information + message_to_send)
+        # Hand over the session secret, only the owner of the private key can read it. Resumed sessions keep theirs.
+        if client.session is not None and (resumed is None or client.session is not resumed.session):
+            welcome = framing.encode_frame(
+                FrameType.SESSION, client.client_id, RSA.encrypt(client.session.secret, client.pub_key)
+            ) + welcome
 
-    def process_message(self, client_socket: socket.socket) -> None:
-        # Receive Signature and message
-        sign = self.receive_message(client_socket)
-        message = self.receive_message(client_socket)
+        if not self.send(client, welcome):
+            self.remove_errored_sockets([client_socket])
+            return
 
-        # If disconnected
-        if not message or not sign:
-            client = self.clients[client_socket]
+        if self.history is None:
+            return
 
-            self.logger.error(f"Connection closed [{client.username}@{client.address}]")
-            self.remove_specified_socket(client_socket)
+        # Resumed clients catch up on everything they missed that is still indexed.
+        if resumed is not None and resumed.sequence is not None:
+            self.replay_history(client, self.history.since(client.channel, resumed.sequence))
+        else:
+            self.replay_history(client, self.history.latest(client.channel, HISTORY_REPLAY))
+
+    def watch_idle(self, client: Client) -> None:
+        if client.heartbeat:
+            client.idle_timer = self.timers.schedule(PING_INTERVAL, self.check_idle, client)
+            return
+
+        # Clients that can't answer pings are left to the kernel to probe.
+        client.socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            client.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, max(int(IDLE_TIMEOUT), 1))
+
+    def check_idle(self, client: Client) -> None:
+        client.idle_timer = None
+        if self.clients.get(client.socket) is not client:
+            return
+
+        idle = time.monotonic() - client.last_activity
+
+        if idle >= IDLE_TIMEOUT:
+            self.logger.warning(f"Disconnecting {client.username} [{client.address}], silent for {idle:.0f}s.")
+            self.metrics.inc("idle_disconnects")
+            self.remove_specified_socket(client.socket)
+            return
+
+        # Quiet for a full interval, make sure it's still there. Otherwise check again an interval after it spoke.
+        if idle >= PING_INTERVAL:
+            if not self.send(client, PING_FRAME):
+                self.remove_errored_sockets([client.socket])
+                return
+
+            delay = min(PING_INTERVAL, IDLE_TIMEOUT - idle)
+        else:
+            delay = PING_INTERVAL - idle
+
+        client.idle_timer = self.timers.schedule(delay, self.check_idle, client)
+
+    def process_bus(self, _bus_socket: socket.socket, mask: int) -> None:
+        if mask & selectors.EVENT_WRITE:
+            self.cluster.process_writable()
+
+        if not mask & selectors.EVENT_READ:
+            return
+
+        try:
+            for frame in self.cluster.frames():
+                self.handle_bus_frame(frame)
+        except EOFError:
+            # Without the hub usernames and broadcasts can't be kept consistent, so stop this worker.
+            self.logger.critical(f"Worker {self.cluster.index} lost the cluster hub, shutting down.")
+            self.disconnect()
+
+            # Worker processes exit without running atexit hooks, so drain the log writer here.
+            self.logger.close()
+            sys.exit(1)
+
+    def handle_bus_frame(self, frame: framing.Frame) -> None:
+        if frame.type == BusFrame.RELAY:
+            channel, username, body = unpack_relay(frame.payload)
+            sender = RemoteClient(frame.sender_id, username, channel.decode())
+
+            self.broadcast_message(None, sender, Message(None, body))
+
+        elif frame.type == BusFrame.DIRECT:
+            username, sender, body = unpack_relay(frame.payload)
+            recipient = self.usernames.get(username.decode())
+
+            if recipient is not None and self.clients.get(recipient.socket) is recipient:
+                self.send_direct(RemoteClient(frame.sender_id, sender, None), recipient, Message(None, body))
+
+        elif frame.type == BusFrame.CLAIM_RESULT:
+            client = self.pending_claims.pop(frame.sender_id, None)
+            if client is None:
+                return
+
+            if bytes(frame.payload) == b"\x01":
+                self.accept_client(client)
+            else:
+                self.reject_client(client, f"The username {client.username} is already taken.")
+
+        elif frame.type == BusFrame.JOINED:
+            self.remote_users.add(str(frame.payload, "utf-8"))
+
+        elif frame.type == BusFrame.LEFT:
+            self.remote_users.discard(str(frame.payload, "utf-8"))
+
+    @staticmethod
+    def encode_message(recipient: Client, client: Client, message: Message) -> t.Union[bytes, tuple]:
+        # Uncompressed frames are left in parts, the body may still be a view into the sender's read buffer.
+        if recipient.is_legacy:
+            sender_information = client.username_header + client.raw_username
+            return sender_information + recipient.get_header(message.data), message.data
+
+        if recipient.compression:
+            return encode_compressed_frame(
+                FrameType.MESSAGE, client.client_id, client.relay_prefix, message.data, threshold=COMPRESSION_THRESHOLD
+            )
+
+        return framing.encode_frame_parts(FrameType.MESSAGE, client.client_id, client.relay_prefix, message.data)
+
+    @staticmethod
+    def encode_direct(recipient: Client, client: Client, message: Message) -> bytes:
+        if recipient.is_legacy:
+            # Legacy clients only know sender and message, the sender's name says it's private.
+            sender = client.raw_username + b" (private)"
+            return recipient.get_header(sender) + sender + recipient.get_header(message.data) + message.data
+
+        payload = framing.pack_relayed(client.raw_username, message.data)
+
+        if recipient.compression:
+            return encode_compressed_frame(
+                FrameType.DIRECT, client.client_id, *payload, threshold=COMPRESSION_THRESHOLD
+            )
+
+        return framing.encode_frame(FrameType.DIRECT, client.client_id, *payload)
+
+    @staticmethod
+    def encode_history(recipient: Client, frame: memoryview) -> t.Union[bytes, memoryview]:
+        # History keeps binary frames, sent as they are. Legacy clients are the rare case that pays for a re-encode.
+        if not recipient.is_legacy:
+            return frame
+
+        username, body = framing.unpack_relayed(frame[framing.FRAME_HEADER.size:])
+        return recipient.get_header(username) + username + recipient.get_header(body) + body
+
+    @staticmethod
+    def encode_notice(recipient: Client, notice: bytes) -> bytes:
+        if recipient.is_legacy:
+            sender = b"SERVER"
+            return recipient.get_header(sender) + sender + recipient.get_header(notice) + notice
+
+        return framing.encode_frame(FrameType.NOTICE, 0, notice)
+
+    def send_notice(self, client: Client, notice: str) -> None:
+        if not self.send(client, self.encode_notice(client, notice.encode())):
+            self.remove_errored_sockets([client.socket])
+
+    def send(self, client: Client, data: t.Union[bytes, memoryview, tuple], coalesce: bool = False) -> bool:
+        # Queue the frame and write straight away if nothing was pending. Returns False if the client has to go.
+        # Coalesced frames wait for the flush window, unless enough of them piled up to be worth a write already.
+        queue = client.outbound
+
+        # A frame in parts may borrow the sender's read buffer. It's written from there when nothing is ahead of
+        # it, and only copied to wait in the queue.
+        if isinstance(data, tuple):
+            if not queue and not (coalesce and COALESCE_WINDOW > 0):
+                return self.write_through(client, data)
+
+            data = b"".join(data)
+        was_empty = not queue
+        dropped = queue.dropped
+
+        try:
+            queue.push(data)
+        except SlowConsumerError as exc:
+            self.logger.warning(f"Disconnecting slow consumer {client.username} [{client.address}]. {exc}")
+            self.metrics.inc("slow_consumer_disconnects")
+            return False
+
+        # Counts the frame itself when refused, and older ones discarded to make room for it.
+        if queue.dropped != dropped:
+            self.metrics.inc("dropped_sends", queue.dropped - dropped)
+        else:
+            self.metrics.inc("frames_out")
+
+        held = client.socket in self.coalesced
+
+        if coalesce and COALESCE_WINDOW > 0 and (was_empty or held):
+            if queue.size < COALESCE_BYTES:
+                if not held:
+                    self.coalesced[client.socket] = client
+                    if self.coalesce_deadline is None:
+                        self.coalesce_deadline = time.monotonic() + COALESCE_WINDOW
+
+                return True
+
+            if held:
+                del self.coalesced[client.socket]
+                self.metrics.inc("coalesced_writes")
+        elif not was_empty and not held:
+            return True
+        elif held:
+            # Something that shouldn't wait, it takes the held frames along.
+            del self.coalesced[client.socket]
+
+        return self.write(client)
+
+    def write(self, client: Client) -> bool:
+        queue = client.outbound
+
+        try:
+            self.metrics.inc("bytes_out", queue.flush(client.socket))
+        except OSError:
+            return False
+
+        # Only wait for writability while there's something left to write.
+        if queue:
+            self.selector.modify(client.socket, selectors.EVENT_READ | selectors.EVENT_WRITE, self.process_events)
+
+        return True
+
+    def write_through(self, client: Client, parts: tuple) -> bool:
+        queue = client.outbound
+
+        try:
+            self.metrics.inc("bytes_out", queue.write(client.socket, parts))
+        except OSError:
+            return False
+
+        self.metrics.inc("frames_out")
+
+        if queue:
+            self.selector.modify(client.socket, selectors.EVENT_READ | selectors.EVENT_WRITE, self.process_events)
+
+        return True
+
+    def flush_coalesced(self) -> None:
+        coalesced, self.coalesced = self.coalesced, {}
+        self.coalesce_deadline = None
+
+        errored_sockets = []
+
+        for client_socket, client in coalesced.items():
+            # Gone since its frames were queued.
+            if self.clients.get(client_socket) is not client:
+                continue
+
+            self.metrics.inc("coalesced_writes")
+            if not self.write(client):
+                errored_sockets.append(client_socket)
+
+        self.remove_errored_sockets(errored_sockets)
+
+    def process_writable(self, client_socket: socket.socket) -> None:
+        client = self.clients[client_socket]
+
+        start = time.perf_counter()
+        self.metrics.inc("bytes_out", client.outbound.flush(client_socket))
+        self.metrics.observe("flush", time.perf_counter() - start)
+
+        if not client.outbound:
+            self.selector.modify(client_socket, selectors.EVENT_READ, self.process_events)
+
+    def process_events(self, client_socket: socket.socket, mask: int) -> None:
+        if mask & selectors.EVENT_WRITE:
+            self.process_writable(client_socket)
+
+        if mask & selectors.EVENT_READ and client_socket in self.clients:
+            self.process_message(client_socket)
+
+    def broadcast_message(self, sock: t.Optional[socket.socket], client: Client, message: Message) -> None:
+        errored_sockets = []
+
+        # Encoded (and compressed) once per wire format rather than once per recipient, and shared by every queue.
+        encoded = {}
+
+        for recipient in self.channels.members(client.channel):
+            if recipient.socket != sock:
+                message_to_send = encoded.get(recipient.wire_format)
+                if message_to_send is None:
+                    message_to_send = encoded[recipient.wire_format] = self.encode_message(
+                        recipient, client, message
+                    )
+
+                if not self.send(recipient, message_to_send, coalesce=True):
+                    errored_sockets.append(recipient.socket)
+
+        if self.history is not None:
+            frame = encoded.get((framing.PROTOCOL_VERSION, False))
+            if frame is None:
+                frame = framing.encode_frame_parts(
+                    FrameType.MESSAGE, client.client_id, client.relay_prefix, message.data
+                )
+
+            self.history.append(client.channel, *frame)
+
+        # A failing recipient should not take the sender down with it.
+        self.remove_errored_sockets(errored_sockets)
+
+    def send_direct(self, client: Client, recipient: Client, message: Message) -> None:
+        # A single socket, looked up by name, whatever the number of connected clients.
+        if not self.send(recipient, self.encode_direct(recipient, client, message)):
+            self.remove_errored_sockets([recipient.socket])
+
+    def publish_message(self, client: Client, message: Message) -> None:
+        start = time.perf_counter()
+        self.broadcast_message(client.socket, client, message)
+        self.metrics.observe("broadcast", time.perf_counter() - start)
+
+        # Other workers deliver it to their own members of the channel.
+        if self.cluster is not None:
+            relay = pack_relay(client.channel.encode(), client.raw_username, message.data)
+            self.cluster.send(BusFrame.RELAY, client.client_id, *relay)
+
+    def receive_signed_messages(self, client: Client) -> t.Iterator[t.Tuple[Message, Message]]:
+        if client.is_legacy:
+            for sign, message in client.decoder.pairs(client.read_buffer):
+                yield Message(None, sign), Message(None, message)
 
             return
 
+        for frame in client.decoder.frames(client.read_buffer):
+            # Pongs only matter as a sign of life, and reading them already counted as one.
+            if frame.type == FrameType.PONG:
+                continue
+
+            if frame.type != FrameType.MESSAGE:
+                raise framing.ProtocolError(f"Unexpected frame type {frame.type}.")
+
+            sign, message = framing.unpack_signed(frame.payload)
+            yield Message(None, sign), Message(None, message)
+
+    def process_message(self, client_socket: socket.socket) -> None:
         # Get the client
         client = self.clients[client_socket]
 
-        # Verify key
+        start = time.perf_counter()
         try:
-            if rsa.verify(message.data, sign.data, client.pub_key):
-                msg = message.data.decode()
+            received = client.read_buffer.recv_into(client_socket)
+        except (BlockingIOError, InterruptedError):
+            return
+
+        client.last_activity = time.monotonic()
+
+        self.metrics.observe("read", time.perf_counter() - start)
+        self.metrics.inc("bytes_in", received)
+
+        # If disconnected
+        if not received:
+            self.logger.error(f"Connection closed [{client.username}@{client.address}]")
+            self.remove_specified_socket(client_socket)
+
+            return
+
+        # Handle every complete message that arrived, partial ones wait for the next event.
+        try:
+            for sign, message in self.receive_signed_messages(client):
+                self.handle_message(client, sign, message)
+
+                if client_socket not in self.clients:
+                    return
+        except framing.ProtocolError as exc:
+            self.logger.error(f"Protocol error from [{client.username}@{client.address}]: {exc}")
+            self.metrics.inc("protocol_errors")
+            self.remove_specified_socket(client_socket)
+            return
+
+        # Everything was copied out, an idle connection doesn't need to hold on to a buffer.
+        client.read_buffer.release()
+
+    def handle_message(self, client: Client, sign: Message, message: Message) -> None:
+        self.metrics.inc("frames_in")
+
+        if self.capture is not None:
+            self.record(CaptureEvent.MESSAGE, client, message.data)
+
+        # HMACs are cheap enough to check right here, so the message is relayed straight from the views into the
+        # read buffer. Nothing can be waiting ahead of it, sessions never queue verifications.
+        if client.session is not None:
+            start = time.perf_counter()
+            verified = client.session.verify(sign.data, message.data)
+            self.metrics.observe("verify", time.perf_counter() - start)
+
+            self.deliver_message(client, message, verified)
+            return
+
+        # RSA signatures go to the worker pool. The received views are reused by the next read, the pending check
+        # needs its own copy.
+        job = Verification(client, bytes(sign.data), Message(None, bytes(message.data)))
+        client.queue_verification(job)
+
+        self.verifier.submit(job)
+        self.release_verified(client)
+
+    def process_verified(self, _wakeup_socket: socket.socket, _mask: int) -> None:
+        for job in self.verifier.completed():
+            if isinstance(job, KeyLoad):
+                self.finish_handshake(job)
+                continue
+
+            client = job.client
+
+            # The sender may have left while its messages were being checked.
+            if self.clients.get(client.socket) is client:
+                self.release_verified(client)
+
+    def release_verified(self, client: Client) -> None:
+        # Messages leave in the order they were sent, even if a later batch finished first.
+        pending = client.pending_verifications
+
+        while pending and pending[0].verified is not None:
+            job = pending.popleft()
+            self.metrics.observe("verify", time.perf_counter() - job.created)
+
+            self.deliver_message(client, job.message, job.verified)
 
-                self.logger.message(client.username, msg)
-                self.broadcast_message(client_socket, client, message)
-        except rsa.VerificationError:
+            if self.clients.get(client.socket) is not client:
+                return
+
+    def deliver_message(self, client: Client, message: Message, verified: bool) -> None:
+        # Only verified messages reach the channel
+        if verified:
+            if message.data[:1] == b"/":
+                self.process_command(client, str(message))
+                return
+
+            # Only decoded if the line is going to be logged.
+            if self.logger.is_enabled("message"):
+                start = time.perf_counter()
+                self.logger.message(client.username, str(message))
+                self.metrics.observe("log", time.perf_counter() - start)
+
+            self.publish_message(client, message)
+        else:
+            self.metrics.inc("verify_failures")
             self.logger.warning(
                 f"Received incorrect verification from {client.address} [{client.username}] | "
-                f"message:{message.data.decode()})"
+                f"message:{message})"
             )
 
             warning = Message(None, "Messaging failed from user due to incorrect verification.".encode())
             warning.header = client.get_header(warning.data)
 
-            self.broadcast_message(client_socket, client, warning)
+            self.publish_message(client, warning)
+
+    def process_command(self, client: Client, command: str) -> None:
+        name, _, arguments = command[1:].partition(" ")
+        handler = self.commands.get(name.lower())
+
+        if handler is None:
+            self.send_notice(client, f"Unknown command /{name}. Available: {', '.join(sorted(self.commands))}")
+            return
+
+        handler(client, arguments.strip())
+
+    def command_join(self, client: Client, channel: str) -> None:
+        if not self.channels.is_valid_name(channel):
+            self.send_notice(client, "Usage: /join <channel>")
+            return
+
+        self.channels.join(client, channel)
+
+        self.logger.info(f"{client.username} [{client.address}] joined #{channel}.")
+        self.send_notice(client, f"Joined #{channel} ({len(self.channels.members(channel))} members).")
+
+        if self.history is not None:
+            self.replay_history(client, self.history.latest(channel, HISTORY_REPLAY))
+
+    def command_leave(self, client: Client, _arguments: str) -> None:
+        if client.channel == self.channels.default:
+            self.send_notice(client, f"Already in the default channel #{client.channel}.")
+            return
+
+        self.command_join(client, self.channels.default)
+
+    def command_list(self, client: Client, _arguments: str) -> None:
+        channels = ", ".join(f"#{name} ({members})" for name, members in self.channels.listing())
+        self.send_notice(client, f"Channels: {channels}")
+
+    def command_who(self, client: Client, _arguments: str) -> None:
+        online = [name for name, user in self.usernames.items() if self.clients.get(user.socket) is user]
+        online = sorted(online + list(self.remote_users))
+
+        self.send_notice(client, f"Online ({len(online)}): {', '.join(online)}")
+
+    def command_msg(self, client: Client, arguments: str) -> None:
+        username, _, text = arguments.partition(" ")
+        text = text.strip()
+
+        if not username or not text:
+            self.send_notice(client, "Usage: /msg <user> <message>")
             return
+
+        message = Message(None, text.encode())
+        recipient = self.usernames.get(username)
+
+        # Names still being admitted are in the index but can't be written to yet.
+        if recipient is not None and self.clients.get(recipient.socket) is recipient:
+            self.send_direct(client, recipient, message)
+        elif username in self.remote_users:
+            self.cluster.send(
+                BusFrame.DIRECT, client.client_id, *pack_relay(username.encode(), client.raw_username, message.data)
+            )
+        else:
+            self.send_notice(client, f"No user named {username} is online.")
+            return
+
+        self.metrics.inc("direct_messages")
+
+    def command_history(self, client: Client, arguments: str) -> None:
+        if self.history is None:
+            self.send_notice(client, "History is disabled on this server.")
+            return
+
+        count, _, since = arguments.partition(" ")
+
+        if count == "since" and since.isdigit():
+            records = self.history.since(client.channel, int(since))
+        elif count.isdigit() or not count:
+            records = self.history.latest(client.channel, int(count) if count else HISTORY_REPLAY)
+        else:
+            self.send_notice(client, "Usage: /history [<count> | since <sequence>]")
+            return
+
+        self.replay_history(client, records)
+
+        if not records:
+            self.send_notice(client, f"No history for #{client.channel}.")
+
+    def replay_history(self, client: Client, records: t.List[t.Tuple[int, memoryview]]) -> None:
+        if not records:
+            return
+
+        for _sequence, frame in records:
+            if not self.send(client, self.encode_history(client, frame)):
+                self.remove_errored_sockets([client.socket])
+                return
+
+        # The sequence lets a client that comes back ask for everything it missed.
+        self.send_notice(client, f"Replayed {len(records)} messages from #{client.channel}, up to #{records[-1][0]}.")
@@ -1,46 +1,134 @@
+import collections
 import socket
+import time
 import typing as t
 
-from .message import Message
-from ..config import HEADER_LENGTH
-from ..encryption.rsa import RSA
+from rsa.key import PublicKey
+
+from ..config import HEADER_LENGTH, SEND_HIGH_WATERMARK, SEND_LOW_WATERMARK, SLOW_CONSUMER_POLICY
+from ..protocol import BinaryDecoder, LegacyDecoder, OutboundQueue, ReadBuffer, SlowConsumerPolicy, framing
+
+POLICY = SlowConsumerPolicy(SLOW_CONSUMER_POLICY)
 
 
 class Client:
     __slots__ = (
         "socket",
-        "ip",
-        "port",
-        "address",
-        "username_header",
+        "client_id",
+        "protocol",
+        "peer",
         "raw_username",
+        "relay_prefix",
         "username",
-        "pub_key_header",
-        "pub_key_pem",
         "pub_key",
+        "read_buffer",
+        "decoder",
+        "outbound",
+        "channel",
+        "pending_verifications",
+        "session",
+        "wire_format",
+        "heartbeat",
+        "last_activity",
+        "idle_timer",
+        "resumable",
+        "resume_token",
+        "resumed",
     )
 
     def __init__(
         self,
         client_socket: socket.socket,
         address: t.Union[list, tuple],
-        username: Message,
-        pub_key: Message
+        username: bytes,
+        public_key: PublicKey,
+        client_id: int = 0,
+        protocol: int = 0
     ) -> None:
         self.socket = client_socket
 
-        self.ip, self.port = address
-        self.address = f"{address[0]}:{address[1]}"
+        # Sender id used in binary frames, and the negotiated protocol version (0 for legacy headers).
+        self.client_id = client_id
+        self.protocol = protocol
+
+        # Inbound bytes are reassembled here until complete frames are available.
+        self.read_buffer = ReadBuffer()
+        self.decoder = LegacyDecoder(HEADER_LENGTH) if self.is_legacy else BinaryDecoder()
+
+        # Channel the client currently talks in, maintained by the server's channel index.
+        self.channel = None
+
+        # HMAC session negotiated at handshake, None while messages are RSA signed.
+        self.session = None
+
+        # Whether the client answers pings, when it was last heard from, and the timer checking on it.
+        self.heartbeat = False
+        self.last_activity = time.monotonic()
+        self.idle_timer = None
+
+        # Whether the client can resume its session later, the token it was handed for that once admitted, and the
+        # state it resumed from itself, if any.
+        self.resumable = False
+        self.resume_token = None
+        self.resumed = None
+
+        # Protocol version and whether frames to the client may be compressed. Clients sharing it get the
+        # same encoded bytes on broadcast.
+        self.wire_format = (protocol, False)
+
+        # Messages waiting on their signature check, released strictly in this order. Created on the first one.
+        self.pending_verifications = None
+
+        # Frames waiting for the socket to become writable.
+        self.outbound = OutboundQueue(SEND_HIGH_WATERMARK, SEND_LOW_WATERMARK, POLICY)
+
+        # Kept as accepted, the printable form is only built for log lines.
+        self.peer = address
+
+        # The raw name goes into every relayed frame, the decoded one is the key for lookups and logs. Binary frames
+        # relayed from the client start with the same prefix, built once here.
+        # The handshake only admits names that fit, bad ones are cut down here rather than raising on the loop.
+        self.raw_username = username
+        self.relay_prefix = framing.pack_relayed_prefix(username[:framing.MAX_NAME_LENGTH])
+        self.username = username.decode("utf-8", "replace")
+
+        # Parsed off the event loop during the handshake, the PEM isn't kept.
+        self.pub_key = public_key
+
+    @property
+    def ip(self) -> str:
+        return self.peer[0]
+
+    @property
+    def port(self) -> int:
+        return self.peer[1]
+
+    @property
+    def address(self) -> str:
+        return f"{self.peer[0]}:{self.peer[1]}"
+
+    @property
+    def username_header(self) -> bytes:
+        # Padded to the full header length, so only built when a legacy client needs it.
+        return self.get_header(self.raw_username)
+
+    @property
+    def is_legacy(self) -> bool:
+        return self.protocol == 0
+
+    @property
+    def compression(self) -> bool:
+        return self.wire_format[1]
 
-        self.username_header = username.header
-        self.raw_username = username.data
-        self.username = self.raw_username.decode()
+    def enable_compression(self) -> None:
+        self.wire_format = (self.protocol, True)
+        self.decoder.compression = True
 
-        if pub_key:
-            self.pub_key_header = pub_key.header
-            self.pub_key_pem = pub_key.data
+    def queue_verification(self, job: t.Any) -> None:
+        if self.pending_verifications is None:
+            self.pending_verifications = collections.deque()
 
-            self.pub_key = RSA.load_key_pkcs1(self.pub_key_pem)
+        self.pending_verifications.append(job)
 
     @staticmethod
     def get_header(message: str) -> bytes:
@@ -0,0 +1,16 @@
+from .buffer import ReadBuffer
+from .compression import compress, decompress, encode_compressed_frame
+from .decoder import BinaryDecoder, LegacyDecoder
+from .framing import (
+    Capability,
+    Frame,
+    FrameType,
+    MAGIC,
+    PROTOCOL_VERSION,
+    ProtocolError,
+    decode_preamble,
+    encode_frame,
+    encode_preamble,
+    recv_frame,
+)
+from .outbound import OutboundQueue, SlowConsumerError, SlowConsumerPolicy
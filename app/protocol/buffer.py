@@ -0,0 +1,97 @@
+import socket
+import typing as t
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+# Smallest free tail worth handing to `recv_into`, below this the buffer is compacted first.
+MIN_READ_SIZE = 4 * 1024
+
+# Drained buffers of the default size kept for the next connection with something to read, so idle
+# connections hold no buffer and busy ones don't allocate one per read.
+MAX_SPARE_BUFFERS = 64
+_spare_buffers = []
+
+_EMPTY_BUFFER = bytearray()
+_EMPTY_VIEW = memoryview(_EMPTY_BUFFER)
+
+
+# Per-connection receive buffer filled through `recv_into`. Views returned by `peek` and `consume` point
+# into the buffer and are only valid until the next `recv_into`, copy anything that has to outlive the event.
+class ReadBuffer:
+    __slots__ = ("_size", "_buffer", "_view", "_start", "_end")
+
+    def __init__(self, size: int = DEFAULT_BUFFER_SIZE) -> None:
+        # Allocated on the first read, and given back by `release` once drained.
+        self._size = size
+        self._buffer = _EMPTY_BUFFER
+        self._view = _EMPTY_VIEW
+
+        # Unread data lives in `_buffer[_start:_end]`.
+        self._start = 0
+        self._end = 0
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    @property
+    def capacity(self) -> int:
+        return len(self._buffer)
+
+    def reserve(self, size: int) -> None:
+        # Make room for at least `size` unread bytes, so a large frame can be read in as few calls as possible.
+        if self._start + size <= len(self._buffer):
+            return
+
+        pending = self._end - self._start
+
+        if size <= len(self._buffer):
+            self._view[:pending] = self._view[self._start:self._end]
+        elif not pending and size <= DEFAULT_BUFFER_SIZE == self._size and _spare_buffers:
+            self._buffer, self._view = _spare_buffers.pop()
+        else:
+            # Outstanding views keep the old buffer alive, so allocate rather than resize in place.
+            buffer = bytearray(max(size, len(self._buffer) * 2, self._size))
+            buffer[:pending] = self._view[self._start:self._end]
+
+            self._buffer = buffer
+            self._view = memoryview(buffer)
+
+        self._start = 0
+        self._end = pending
+
+    def recv_into(self, sock: socket.socket) -> int:
+        if len(self._buffer) - self._end < MIN_READ_SIZE:
+            self.reserve(len(self) + MIN_READ_SIZE)
+
+        received = sock.recv_into(self._view[self._end:])
+        self._end += received
+
+        return received
+
+    def release(self) -> None:
+        # Drops the buffer while nothing is pending. Views into it must not be used after this.
+        if self._start != self._end or self._buffer is _EMPTY_BUFFER:
+            return
+
+        if len(self._buffer) == DEFAULT_BUFFER_SIZE and len(_spare_buffers) < MAX_SPARE_BUFFERS:
+            _spare_buffers.append((self._buffer, self._view))
+
+        self._buffer = _EMPTY_BUFFER
+        self._view = _EMPTY_VIEW
+        self._start = self._end = 0
+
+    def peek(self, size: t.Optional[int] = None) -> memoryview:
+        end = self._end if size is None else min(self._start + size, self._end)
+        return self._view[self._start:end]
+
+    def consume(self, size: int) -> memoryview:
+        if size < 0:
+            raise ValueError(f"Can't consume {size} bytes.")
+
+        view = self._view[self._start:self._start + size]
+        self._start += size
+
+        # Rewind once drained, which keeps the common case free of compaction copies.
+        if self._start == self._end:
+            self._start = self._end = 0
+
+        return view
@@ -0,0 +1,51 @@
+import zlib
+
+from .framing import COMPRESSED, MAX_PAYLOAD_LENGTH, ProtocolError, encode_frame
+
+# Preset dictionary shared by both ends. Deflate looks back into it for matches, so even short messages
+# compress, and the most likely strings sit at the end where their distances are shortest.
+DICTIONARY = (
+    b"-----BEGIN RSA PUBLIC KEY----------END RSA PUBLIC KEY-----"
+    b"Replayed messages from #Joined #members).Channels: Online (Unknown command /Usage: /"
+    b"Welcome to Zerocom Chat!Messaging failed from user due to incorrect verification."
+    b"http://https://www..com/ :) :( :D xD haha lol lmao brb afk idk imo btw thanks thank you "
+    b"good morning good night hello hey hi everyone yes no okay ok sure what why how when where who "
+    b"could would should can't don't doesn't isn't it's I'm you're that's there is are was were will "
+    b"have has had been be do does did not but and the for with this that from your you what just like "
+    b"know think about going to get got really right now here today tomorrow "
+)
+
+# Deflate level, compression runs once per broadcast so a middle level buys most of the savings.
+LEVEL = 6
+
+
+def compress(payload: bytes) -> bytes:
+    compressor = zlib.compressobj(LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=DICTIONARY)
+    return compressor.compress(payload) + compressor.flush()
+
+
+def decompress(payload: bytes, max_length: int = MAX_PAYLOAD_LENGTH) -> bytes:
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=DICTIONARY)
+
+    try:
+        data = decompressor.decompress(payload, max_length)
+    except zlib.error as exc:
+        raise ProtocolError(f"Corrupt compressed payload: {exc}") from None
+
+    # Guards against small frames inflating to something huge.
+    if decompressor.unconsumed_tail:
+        raise ProtocolError(f"Compressed payload inflates beyond {max_length} bytes.")
+
+    return data
+
+
+def encode_compressed_frame(frame_type: int, sender_id: int, *parts: bytes, threshold: int) -> bytes:
+    # Small payloads, and payloads deflate can't shrink, go out as they are.
+    payload = b"".join(parts)
+
+    if len(payload) >= threshold:
+        compressed = compress(payload)
+        if len(compressed) < len(payload):
+            return encode_frame(frame_type | COMPRESSED, sender_id, compressed)
+
+    return encode_frame(frame_type, sender_id, payload)
@@ -0,0 +1,71 @@
+import typing as t
+
+from .buffer import ReadBuffer
+from .compression import decompress
+from .framing import COMPRESSED, FRAME_HEADER, Frame, MAX_PAYLOAD_LENGTH, ProtocolError, decode_header
+
+
+class BinaryDecoder:
+    __slots__ = ("compression",)
+
+    def __init__(self, compression: bool = False) -> None:
+        # Whether the peer negotiated compressed frames, anyone else sending them is in violation.
+        self.compression = compression
+
+    def frames(self, buffer: ReadBuffer) -> t.Iterator[Frame]:
+        # Yield every complete frame in the buffer, a trailing partial frame stays put for the next read.
+        while len(buffer) >= FRAME_HEADER.size:
+            frame_type, sender_id, length = decode_header(buffer.peek(FRAME_HEADER.size))
+
+            if len(buffer) < FRAME_HEADER.size + length:
+                buffer.reserve(FRAME_HEADER.size + length)
+                return
+
+            buffer.consume(FRAME_HEADER.size)
+            payload = buffer.consume(length)
+
+            if frame_type & COMPRESSED:
+                if not self.compression:
+                    raise ProtocolError("Compressed frame without negotiated compression.")
+
+                frame_type &= ~COMPRESSED
+                payload = decompress(payload)
+
+            yield Frame(frame_type, sender_id, payload)
+
+
+# Fixed-width ASCII headers, frames always travel in pairs (signature/message, username/message).
+class LegacyDecoder:
+    __slots__ = ("header_length", "_pending")
+
+    def __init__(self, header_length: int) -> None:
+        self.header_length = header_length
+        self._pending = None
+
+    def _frames(self, buffer: ReadBuffer) -> t.Iterator[memoryview]:
+        while len(buffer) >= self.header_length:
+            # Digits padded with spaces. `int` would also take signs, and a negative length would move the buffer back.
+            header = bytes(buffer.peek(self.header_length)).strip()
+            if not header.isdigit():
+                raise ProtocolError("Malformed length header.")
+
+            length = int(header)
+            if length > MAX_PAYLOAD_LENGTH:
+                raise ProtocolError(f"Frame of {length} bytes exceeds the limit of {MAX_PAYLOAD_LENGTH} bytes.")
+
+            if len(buffer) < self.header_length + length:
+                buffer.reserve(self.header_length + length)
+                return
+
+            buffer.consume(self.header_length)
+            yield buffer.consume(length)
+
+    def pairs(self, buffer: ReadBuffer) -> t.Iterator[t.Tuple[bytes, memoryview]]:
+        for data in self._frames(buffer):
+            if self._pending is None:
+                # The first half may have to wait for the next read, so it can't stay a view.
+                self._pending = bytes(data)
+                continue
+
+            first, self._pending = self._pending, None
+            yield first, data
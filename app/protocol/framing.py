@@ -0,0 +1,215 @@
+import enum
+import socket
+import struct
+import typing as t
+
+# Sent by both ends before the first binary frame. Legacy peers start with an ASCII length header instead.
+MAGIC = b"ZCOM"
+PROTOCOL_VERSION = 1
+
+# Magic, protocol version, capability flags.
+PREAMBLE = struct.Struct("!4sBH")
+# Frame type, sender id, payload length.
+FRAME_HEADER = struct.Struct("!BII")
+
+# Set on the frame type when the payload is deflated, only sent to peers that negotiated compression.
+COMPRESSED = 0x80
+
+# Upper bound for a single frame payload, anything above is treated as a protocol violation.
+MAX_PAYLOAD_LENGTH = 1 << 20
+
+# Usernames travel behind a single length byte.
+MAX_NAME_LENGTH = 255
+
+_NAME_LENGTH = struct.Struct("!B")
+_TAG_LENGTH = struct.Struct("!H")
+
+
+class FrameType(enum.IntEnum):
+    HELLO = 1
+    WELCOME = 2
+    MESSAGE = 3
+    ERROR = 4
+    NOTICE = 5
+    SESSION = 6
+    PING = 7
+    PONG = 8
+    # Server to client: a resumption token encrypted to the client's key. Client to server, in place of HELLO:
+    # a token from an earlier connection.
+    RESUME = 9
+    # Server to client: a private message, laid out like MESSAGE.
+    DIRECT = 10
+
+
+class Capability(enum.IntFlag):
+    NONE = 0
+    # Messages are authenticated with a per-session HMAC instead of RSA signatures.
+    SESSION_MAC = 1 << 0
+    # Payloads above a size threshold may be deflated with a preset dictionary.
+    COMPRESSION = 1 << 1
+    # The peer answers PING frames with a PONG, so idle connections can be told apart from dead ones.
+    HEARTBEAT = 1 << 2
+    # A reconnecting client may present a token instead of its username and key.
+    RESUME = 1 << 3
+
+
+SUPPORTED_CAPABILITIES = Capability.SESSION_MAC | Capability.COMPRESSION | Capability.HEARTBEAT | Capability.RESUME
+
+
+def enabled_capabilities(
+    session_mac: bool, compression: bool = False, heartbeat: bool = False, resume: bool = False
+) -> Capability:
+    capabilities = Capability.NONE
+
+    if session_mac:
+        capabilities |= Capability.SESSION_MAC
+
+    if compression:
+        capabilities |= Capability.COMPRESSION
+
+    if heartbeat:
+        capabilities |= Capability.HEARTBEAT
+
+    if resume:
+        capabilities |= Capability.RESUME
+
+    return capabilities
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class Frame:
+    __slots__ = ("type", "sender_id", "payload")
+
+    def __init__(self, frame_type: int, sender_id: int, payload: bytes) -> None:
+        self.type = frame_type
+        self.sender_id = sender_id
+        self.payload = payload
+
+    def __repr__(self) -> str:
+        return f"<Frame type={self.type} sender_id={self.sender_id} length={len(self.payload)}>"
+
+
+def encode_preamble(version: int = PROTOCOL_VERSION, capabilities: int = SUPPORTED_CAPABILITIES) -> bytes:
+    return PREAMBLE.pack(MAGIC, version, capabilities)
+
+
+def decode_preamble(data: bytes) -> t.Tuple[int, Capability]:
+    magic, version, capabilities = PREAMBLE.unpack(data)
+
+    if magic != MAGIC:
+        raise ProtocolError("Peer does not speak the binary protocol.")
+
+    return version, Capability(capabilities & SUPPORTED_CAPABILITIES)
+
+
+def negotiate(
+    version: int, capabilities: int, enabled: int = SUPPORTED_CAPABILITIES
+) -> t.Tuple[int, Capability]:
+    # Version 0 stands for legacy headers, which never start with a preamble.
+    if version < 1:
+        raise ProtocolError(f"Unsupported protocol version {version}.")
+
+    return min(version, PROTOCOL_VERSION), Capability(capabilities & SUPPORTED_CAPABILITIES & enabled)
+
+
+def encode_frame(frame_type: int, sender_id: int, *parts: bytes) -> bytes:
+    length = sum(len(part) for part in parts)
+    return b"".join((FRAME_HEADER.pack(frame_type, sender_id, length), *parts))
+
+
+def encode_frame_parts(
+    frame_type: int, sender_id: int, prefix: bytes, body: t.Union[bytes, memoryview]
+) -> t.Tuple[bytes, t.Union[bytes, memoryview]]:
+    # Same bytes as `encode_frame(frame_type, sender_id, prefix, body)`, with the body left where it is.
+    return FRAME_HEADER.pack(frame_type, sender_id, len(prefix) + len(body)) + prefix, body
+
+
+def decode_header(data: bytes) -> t.Tuple[int, int, int]:
+    frame_type, sender_id, length = FRAME_HEADER.unpack(data)
+
+    if length > MAX_PAYLOAD_LENGTH:
+        raise ProtocolError(f"Frame of {length} bytes exceeds the limit of {MAX_PAYLOAD_LENGTH} bytes.")
+
+    return frame_type, sender_id, length
+
+
+# Payload layouts.
+def _split_prefixed(payload: bytes, length_struct: struct.Struct) -> t.Tuple[bytes, bytes]:
+    try:
+        (length,) = length_struct.unpack_from(payload)
+    except struct.error:
+        raise ProtocolError("Truncated payload.") from None
+
+    offset = length_struct.size
+    if offset + length > len(payload):
+        raise ProtocolError("Truncated payload.")
+
+    return payload[offset:offset + length], payload[offset + length:]
+
+
+def _pack_name_length(name: bytes) -> bytes:
+    if len(name) > MAX_NAME_LENGTH:
+        raise ProtocolError(f"Name of {len(name)} bytes exceeds the limit of {MAX_NAME_LENGTH} bytes.")
+
+    return _NAME_LENGTH.pack(len(name))
+
+
+def pack_hello(username: bytes, public_key_pem: bytes) -> t.Tuple[bytes, ...]:
+    return _pack_name_length(username), username, public_key_pem
+
+
+def unpack_hello(payload: bytes) -> t.Tuple[bytes, bytes]:
+    return _split_prefixed(payload, _NAME_LENGTH)
+
+
+def pack_signed(tag: bytes, body: bytes) -> t.Tuple[bytes, ...]:
+    return _TAG_LENGTH.pack(len(tag)), tag, body
+
+
+def unpack_signed(payload: bytes) -> t.Tuple[bytes, bytes]:
+    return _split_prefixed(payload, _TAG_LENGTH)
+
+
+def pack_relayed(username: bytes, body: bytes) -> t.Tuple[bytes, ...]:
+    return _pack_name_length(username), username, body
+
+
+def pack_relayed_prefix(username: bytes) -> bytes:
+    # Everything `pack_relayed` puts before the body, for a sender to build once.
+    return _pack_name_length(username) + username
+
+
+def unpack_relayed(payload: bytes) -> t.Tuple[bytes, bytes]:
+    return _split_prefixed(payload, _NAME_LENGTH)
+
+
+# Blocking socket helpers.
+def recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            return b""
+
+        chunks.append(chunk)
+        size -= len(chunk)
+
+    return b"".join(chunks)
+
+
+def recv_frame(sock: socket.socket) -> t.Optional[Frame]:
+    header = recv_exact(sock, FRAME_HEADER.size)
+    if not header:
+        return
+
+    frame_type, sender_id, length = decode_header(header)
+
+    payload = recv_exact(sock, length) if length else b""
+    if length and not payload:
+        return
+
+    return Frame(frame_type, sender_id, payload)
@@ -0,0 +1,168 @@
+import collections
+import enum
+import itertools
+import os
+import socket
+import typing as t
+
+# Cap the number of buffers handed to a single `sendmsg` call.
+try:
+    IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 16
+
+if IOV_MAX <= 0:
+    IOV_MAX = 16
+
+# Stands in for the deque while nothing is queued, which is most of the time for most connections.
+_NO_CHUNKS = ()
+
+
+class SlowConsumerPolicy(enum.Enum):
+    # Stop queueing for the client until it drains back to the low watermark.
+    DROP = "drop"
+    # Close the connection once the high watermark is crossed.
+    DISCONNECT = "disconnect"
+    # Discard the oldest unsent frames to make room for the newest ones.
+    COALESCE = "coalesce"
+
+
+class SlowConsumerError(Exception):
+    pass
+
+
+class OutboundQueue:
+    __slots__ = (
+        "_chunks",
+        "_offset",
+        "size",
+        "high_watermark",
+        "low_watermark",
+        "policy",
+        "paused",
+        "dropped",
+    )
+
+    def __init__(
+        self,
+        high_watermark: int,
+        low_watermark: int,
+        policy: SlowConsumerPolicy = SlowConsumerPolicy.DROP
+    ) -> None:
+        # Whole frames waiting to be written, `_offset` bytes of the first one are already on the wire.
+        self._chunks = _NO_CHUNKS
+        self._offset = 0
+        self.size = 0
+
+        self.high_watermark = high_watermark
+        self.low_watermark = min(low_watermark, high_watermark)
+        self.policy = policy
+
+        self.paused = False
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def __bool__(self) -> bool:
+        return bool(self._chunks)
+
+    def push(self, data: t.Union[bytes, memoryview]) -> bool:
+        # Returns whether the frame was queued, raises `SlowConsumerError` when the client has to go.
+        if self.paused:
+            self.dropped += 1
+            return False
+
+        if self.size + len(data) > self.high_watermark and self._chunks:
+            if self.policy is SlowConsumerPolicy.DISCONNECT:
+                raise SlowConsumerError(f"{self.size} bytes pending, above the high watermark.")
+
+            if self.policy is SlowConsumerPolicy.DROP:
+                self.paused = True
+                self.dropped += 1
+                return False
+
+            self._discard_oldest(self.low_watermark - len(data))
+
+        if self._chunks is _NO_CHUNKS:
+            self._chunks = collections.deque()
+
+        self._chunks.append(data)
+        self.size += len(data)
+
+        return True
+
+    def write(self, sock: socket.socket, parts: t.Sequence[t.Union[bytes, memoryview]]) -> int:
+        # Only for an empty queue. Writes a frame straight from its parts, which may be views into a buffer the
+        # caller reuses right after, and queues a copy only if the socket didn't take all of it.
+        try:
+            sent = self._send(sock, list(parts))
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+
+        if sent < sum(len(part) for part in parts):
+            self.push(b"".join(parts))
+            self._advance(sent)
+
+        return sent
+
+    def _discard_oldest(self, target_size: int) -> None:
+        # The head frame may be partially written already, it has to go out whole.
+        head = self._chunks.popleft() if self._offset else None
+
+        while self._chunks and self.size > target_size:
+            self.size -= len(self._chunks.popleft())
+            self.dropped += 1
+
+        if head is not None:
+            self._chunks.appendleft(head)
+
+    def flush(self, sock: socket.socket) -> int:
+        sent_total = 0
+
+        while self._chunks:
+            buffers = [memoryview(self._chunks[0])[self._offset:]]
+            buffers.extend(itertools.islice(self._chunks, 1, IOV_MAX))
+
+            requested = sum(len(buffer) for buffer in buffers)
+
+            try:
+                sent = self._send(sock, buffers)
+            except (BlockingIOError, InterruptedError):
+                break
+
+            sent_total += sent
+            self._advance(sent)
+
+            # Short write, the socket buffer is full.
+            if sent < requested:
+                break
+
+        if not self._chunks:
+            self._chunks = _NO_CHUNKS
+
+        if self.paused and self.size <= self.low_watermark:
+            self.paused = False
+
+        return sent_total
+
+    @staticmethod
+    def _send(sock: socket.socket, buffers: t.List[memoryview]) -> int:
+        if hasattr(sock, "sendmsg"):
+            return sock.sendmsg(buffers)
+
+        return sock.send(buffers[0])
+
+    def _advance(self, sent: int) -> None:
+        self.size -= sent
+
+        while sent:
+            remaining = len(self._chunks[0]) - self._offset
+
+            if sent < remaining:
+                self._offset += sent
+                return
+
+            sent -= remaining
+            self._chunks.popleft()
+            self._offset = 0
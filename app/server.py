@@ -1,33 +1,50 @@
-import select
+import socket
 import sys
 
-from .config import IP, MAX_CONNECTIONS, PORT
+from .config import IP, MAX_CONNECTIONS, PORT, SERVER_WORKERS
+from .models.cluster import ClusterHub, ClusterLink
 from .models.server import Server
+from .utils import on_startup
 from .utils.contextmanagers import Timer
 
-if __name__ == "__main__":
-    # Initialize the socket
-    server = Server((IP, PORT), MAX_CONNECTIONS)
 
+def run(server: Server) -> None:
     # Connect to the server
     server.connect()
 
-    while True:
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.logger.info("Server stopping...")
+
+        with Timer(lambda x: server.logger.success(f"Server stopped successfully in {x}ms.")):
+            server.disconnect()
+
+        # Worker processes exit without running atexit hooks, so drain the log writer here.
+        server.logger.close()
+        sys.exit(0)
+
+
+def run_worker(index: int, count: int, bus_socket: socket.socket) -> None:
+    run(Server((IP, PORT), MAX_CONNECTIONS, ClusterLink(bus_socket, index, count)))
+
+
+if __name__ == "__main__":
+    if SERVER_WORKERS > 1 and hasattr(socket, "SO_REUSEPORT"):
+        on_startup("Server", ip=IP, port=PORT)
+
+        hub = ClusterHub(SERVER_WORKERS)
+        hub.start(run_worker)
+
         try:
-            ready_to_read, _, in_error = select.select(server.sockets_list, [], server.sockets_list)
+            hub.serve_forever()
         except KeyboardInterrupt:
-            server.logger.info("Server stopping...")
-
-            with Timer(lambda x: server.logger.success(f"Server stopped successfully in {x}ms.")):
-                server.disconnect()
+            hub.stop()
 
-            sys.exit(0)
+        sys.exit(0)
 
-        for socket_ in ready_to_read:
-            if socket_ == server.socket:
-                server.process_connection()
-            else:
-                server.process_message(socket_)
+    if SERVER_WORKERS > 1:
+        print("SO_REUSEPORT is not supported on this platform, running a single worker.")
 
-        # Remove errored connections
-        server.remove_errored_sockets(in_error)
+    # Initialize the socket
+    run(Server((IP, PORT), MAX_CONNECTIONS))
@@ -1,5 +1,9 @@
-from .colors import get_bright_color, get_color
+from .colors import colors_enabled, get_background_color, get_bright_color, get_color
 from .config_loader import config_parser
 from .console import clear_screen
-from .logger import Logger
+from .logger import Logger, QueuedLogger
+from .metrics import Histogram, Metrics
+from .profiler import SamplingProfiler
 from .startup import on_startup
+from .system import raise_file_limit
+from .timers import TimerWheel
@@ -1,11 +1,40 @@
-import colorama
+import functools
+import typing as t
 
-colorama.init(autoreset=True)
+
+@functools.lru_cache(maxsize=None)
+def _colorama() -> t.Any:
+    # Loaded on first use, headless processes never pay for it or have their stdout wrapped.
+    import colorama
+
+    colorama.init(autoreset=True)
+    return colorama
+
+
+@functools.lru_cache(maxsize=None)
+def colors_enabled() -> bool:
+    # Imports To prevent circular imports.
+    from ..config import HEADLESS
+
+    return not HEADLESS
 
 
 def get_color(color: str) -> str:
-    return getattr(colorama.Fore, color.upper())
+    if not colors_enabled():
+        return ""
+
+    return getattr(_colorama().Fore, color.upper())
 
 
 def get_bright_color(color: str) -> str:
-    return getattr(colorama.Style, "BRIGHT") + get_color(color)  # noqa: B009
+    if not colors_enabled():
+        return ""
+
+    return getattr(_colorama().Style, "BRIGHT") + get_color(color)  # noqa: B009
+
+
+def get_background_color(color: str) -> str:
+    if not colors_enabled():
+        return ""
+
+    return getattr(_colorama().Back, color.upper())
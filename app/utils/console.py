@@ -1,8 +1,12 @@
 import os
+import sys
 
 
 def clear_screen() -> None:
     if os.name == "nt":
         os.system("cls")
-    else:
-        os.system("clear")
+        return
+
+    # Escape codes instead of forking `clear`.
+    sys.stdout.write("\033[H\033[2J\033[3J")
+    sys.stdout.flush()
@@ -1,45 +1,86 @@
+import atexit
+import functools
+import json
+import sys
+import threading
+import time
+import typing as t
+from collections import deque
 from datetime import datetime
 
-from colorama import Back
-from rich.console import Console
+from .colors import get_background_color, get_bright_color, get_color
 
-from .colors import get_bright_color, get_color
+# Symbol shown per log type in ANSI output.
+log_symbols = {
+    "error": "%",
+    "warning": "!",
+    "message": ">",
+    "success": "+",
+    "info": "#",
+    "critical": "X",
+    "flash": "-",
+}
 
 
-def get_log_color_mapping(color_key: str, symbol: str) -> str:
-    color_map = log_color_mapping[color_key]
-    return f"[{color_map}{symbol}{get_color('RESET')}]"
+# Color and log type mapping. Built on the first ANSI record, so plain and JSON logging never load colorama.
+@functools.lru_cache(maxsize=None)
+def get_log_color_mapping() -> t.Dict[str, str]:
+    return {
+        "error": get_bright_color("RED"),
+        "warning": get_bright_color("YELLOW"),
+        "message": get_color("CYAN"),
+        "success": get_bright_color("GREEN"),
+        "info": get_bright_color("MAGENTA"),
+        "critical": get_bright_color("RED") + get_background_color("YELLOW"),
+        "flash": get_bright_color("BLUE"),
+    }
 
 
-# Color and log type mapping
-log_color_mapping = {
-    "error": get_bright_color("RED"),
-    "warning": get_bright_color("YELLOW"),
-    "message": get_color("CYAN"),
-    "success": get_bright_color("GREEN"),
-    "info": get_bright_color("MAGENTA"),
-    "critical": get_bright_color("RED") + Back.YELLOW,
-    "flash": get_bright_color("BLUE"),
-}
+@functools.lru_cache(maxsize=None)
+def get_log_mapping() -> t.Dict[str, str]:
+    return {
+        log_type: f"[{color}{log_symbols[log_type]}{get_color('RESET')}]"
+        for log_type, color in get_log_color_mapping().items()
+    }
+
 
-log_mapping = {
-    "error": get_log_color_mapping("error", "%"),
-    "warning": get_log_color_mapping("warning", "!"),
-    "message": get_log_color_mapping("message", ">"),
-    "success": get_log_color_mapping("success", "+"),
-    "info": get_log_color_mapping("info", "#"),
-    "critical": get_log_color_mapping("critical", "X"),
-    "flash": get_log_color_mapping("flash", "-"),
+# Log levels, chat messages are the noisiest and sit below everything else.
+log_levels = {
+    "message": 10,
+    "flash": 20,
+    "info": 20,
+    "success": 20,
+    "warning": 30,
+    "error": 40,
+    "critical": 50,
 }
 
+LOG_FORMATS = ("ansi", "plain", "json")
+OVERFLOW_POLICIES = ("drop", "sample")
+
+# A log record is kept as a plain tuple, so producing one on the hot path stays cheap:
+# `(log_type, username, message, timestamp, date, print_kwargs)`.
+LogRecord = t.Tuple[str, t.Optional[str], str, float, bool, t.Optional[dict]]
+
 
 class Logger:
-    def __init__(self):
-        self._console = Console()
+    def __init__(self, level: str = "message", log_format: str = "ansi", stream: t.Optional[t.TextIO] = None):
+        if log_format not in LOG_FORMATS:
+            raise ValueError(f"Unknown log format `{log_format}`, expected one of {', '.join(LOG_FORMATS)}.")
+
+        self.level = log_levels[level]
+        self.format = log_format
+        self.stream = stream
+
+        # Records lost to overflow, always 0 when writing synchronously.
+        self.dropped = 0
+
+        # Rich is only needed to render chat markup in ANSI output, and loaded the first time it is.
+        self._console = None
 
     @staticmethod
-    def _append_date(message: str) -> str:
-        timestamp = datetime.now()
+    def _append_date(message: str, timestamp: t.Optional[float] = None) -> str:
+        timestamp = datetime.now() if timestamp is None else datetime.fromtimestamp(timestamp)
         timestamp = (
             f"{get_bright_color('CYAN')}"
             f"{timestamp.hour}:{timestamp.minute}:{timestamp.second}"
@@ -48,14 +89,63 @@ class Logger:
 
         return f"[{timestamp}]{message}"
 
+    def is_enabled(self, log_type: str) -> bool:
+        return log_levels[log_type] >= self.level
+
     def _print_log(self, log_type: str, message: str, date: bool = True) -> None:
-        message_prefix = log_mapping[log_type]
-        message = f"{message_prefix} {log_color_mapping[log_type]}{message}"
+        if log_levels[log_type] < self.level:
+            return
+
+        self._emit((log_type, None, message, time.time(), date, None))
+
+    def _emit(self, record: LogRecord) -> None:
+        stream = self.stream or sys.stdout
+        stream.write(self._format(record))
+        stream.flush()
+
+    def _format(self, record: LogRecord) -> str:
+        log_type, username, message, timestamp, date, kwargs = record
 
+        if self.format == "json":
+            entry = {"time": datetime.fromtimestamp(timestamp).isoformat(), "level": log_type, "message": message}
+            if username is not None:
+                entry["username"] = username
+            return json.dumps(entry) + "\n"
+
+        if self.format == "plain":
+            prefix = f"[{datetime.fromtimestamp(timestamp):%H:%M:%S}] " if date else ""
+            if username is not None:
+                return f"{prefix}{username} > {message}" + (kwargs or {}).get("end", "\n")
+            return f"{prefix}[{log_type}] {message}\n"
+
+        if username is None:
+            message = f"{get_log_mapping()[log_type]} {get_log_color_mapping()[log_type]}{message}"
+            return (self._append_date(message, timestamp) if date else message) + "\n"
+
+        prefix = f"{get_bright_color('YELLOW')} {username}{get_color('RESET')} {get_log_mapping()['message']} "
         if date:
-            message = self._append_date(message)
+            prefix = self._append_date(prefix, timestamp)
+
+        if self._console is None:
+            from rich.console import Console
+
+            self._console = Console() if self.stream is None else Console(file=self.stream)
+
+        # Rich markup is rendered here, so queued loggers only pay for it on the writer thread.
+        with self._console.capture() as capture:
+            self._console.print(message, **kwargs)
 
-        print(message)
+        return prefix + capture.get()
+
+    @property
+    def backlog(self) -> int:
+        return 0
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
 
     def error(self, message: str, date: bool = True) -> None:
         self._print_log("error", message, date)
@@ -76,11 +166,121 @@ class Logger:
         self._print_log("flash", message, date)
 
     def message(self, username: str, user_message: str, date: bool = True, **kwargs) -> None:
-        message_prefix = log_mapping["message"]
-        message = f"{get_bright_color('YELLOW')} {username}{get_color('RESET')} {message_prefix} "
+        if log_levels["message"] < self.level:
+            return
 
-        if date:
-            message = self._append_date(message)
+        self._emit(("message", username, user_message, time.time(), date, kwargs))
+
+
+# Hands records to a writer thread, which formats and writes them in batches, so the
+# event loop never waits on the terminal.
+class QueuedLogger(Logger):
+    def __init__(
+        self,
+        level: str = "message",
+        log_format: str = "ansi",
+        stream: t.Optional[t.TextIO] = None,
+        queue_size: int = 10000,
+        overflow_policy: str = "drop",
+        sample_rate: int = 10,
+        flush_interval: float = 0.05,
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"Unknown overflow policy `{overflow_policy}`, expected one of {', '.join(OVERFLOW_POLICIES)}."
+            )
+
+        super().__init__(level, log_format, stream)
+
+        self.queue_size = max(queue_size, 1)
+        self.overflow_policy = overflow_policy
+        self.sample_rate = max(sample_rate, 1)
+        self.flush_interval = flush_interval
+
+        # Dropped records are reported by the writer on its next batch.
+        self._reported = 0
+        self._sampled = 0
+
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._writing = False
+        self._closed = False
+
+        self._writer = threading.Thread(target=self._run, name="logger", daemon=True)
+        self._writer.start()
+
+        atexit.register(self.close)
+
+    def _emit(self, record: LogRecord) -> None:
+        backlog = len(self._queue)
+
+        # Warnings and worse are always kept. Below that, `sample` keeps every Nth record
+        # once the queue is half full, and everything is dropped once it's full.
+        if backlog >= self.queue_size // 2 and log_levels[record[0]] < log_levels["warning"]:
+            if backlog >= self.queue_size or self.overflow_policy == "drop":
+                self.dropped += 1
+                return
+
+            self._sampled += 1
+            if self._sampled % self.sample_rate:
+                self.dropped += 1
+                return
+
+        self._queue.append(record)
+
+        if not self._wakeup.is_set():
+            self._wakeup.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+            closed = self._closed
+            self._write_batch()
+
+            if closed and not self._queue:
+                return
+
+    def _write_batch(self) -> None:
+        queue = self._queue
+        if not queue and self.dropped == self._reported:
+            return
+
+        self._writing = True
+        lines = []
+
+        dropped = self.dropped - self._reported
+        if dropped:
+            self._reported += dropped
+            lines.append(self._format(("warning", None, f"{dropped} log records dropped.", time.time(), True, None)))
+
+        while queue:
+            lines.append(self._format(queue.popleft()))
+
+        stream = self.stream or sys.stdout
+        try:
+            stream.write("".join(lines))
+            stream.flush()
+        except (OSError, ValueError):
+            # Stream closed under us, most likely during interpreter shutdown.
+            pass
+        finally:
+            self._writing = False
+
+    @property
+    def backlog(self) -> int:
+        return len(self._queue)
+
+    def flush(self) -> None:
+        self._wakeup.set()
+        while (self._queue or self._writing) and self._writer.is_alive():
+            time.sleep(self.flush_interval / 10)
+
+    def close(self) -> None:
+        if self._closed:
+            return
 
-        print(message, end="")
-        self._console.print(user_message, **kwargs)
+        self._closed = True
+        self._wakeup.set()
+        self._writer.join()
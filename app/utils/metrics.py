@@ -0,0 +1,92 @@
+import bisect
+import typing as t
+
+# Upper bounds of the latency buckets in seconds, from 10µs to 10s.
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005,
+    0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "count", "total")
+
+    def __init__(self, bounds: t.Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.bounds = tuple(bounds)
+
+        # One slot per bucket plus the overflow, cumulated only when rendered.
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+
+class Metrics:
+    __slots__ = ("prefix", "counters", "stages", "gauges", "descriptions")
+
+    def __init__(self, prefix: str = "zerocom") -> None:
+        self.prefix = prefix
+
+        # Plain dicts, bumping a counter on the hot path is a lookup and an add.
+        self.counters = {}
+        self.stages = {}
+        self.gauges = {}
+        self.descriptions = {}
+
+    def counter(self, name: str, description: str) -> None:
+        self.counters.setdefault(name, 0)
+        self.descriptions[name] = description
+
+    def gauge(self, name: str, description: str, read: t.Callable[[], float]) -> None:
+        # Gauges are read when rendered, so they cost nothing in between.
+        self.gauges[name] = read
+        self.descriptions[name] = description
+
+    def inc(self, name: str, amount: int = 1) -> None:
+        self.counters[name] += amount
+
+    def observe(self, stage: str, seconds: float) -> None:
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram()
+
+        histogram.observe(seconds)
+
+    def render(self) -> str:
+        # Prometheus text exposition format.
+        lines = []
+
+        for name, value in self.counters.items():
+            metric = f"{self.prefix}_{name}_total"
+            lines += [f"# HELP {metric} {self.descriptions[name]}", f"# TYPE {metric} counter", f"{metric} {value}"]
+
+        for name, read in self.gauges.items():
+            metric = f"{self.prefix}_{name}"
+            lines += [f"# HELP {metric} {self.descriptions[name]}", f"# TYPE {metric} gauge", f"{metric} {read()}"]
+
+        if self.stages:
+            metric = f"{self.prefix}_stage_seconds"
+            lines += [f"# HELP {metric} Time spent per server stage.", f"# TYPE {metric} histogram"]
+
+        for stage, histogram in self.stages.items():
+            cumulative = 0
+
+            for bound, count in zip(histogram.bounds, histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+
+            lines += [
+                f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}',
+                f'{metric}_sum{{stage="{stage}"}} {histogram.total}',
+                f'{metric}_count{{stage="{stage}"}} {histogram.count}',
+            ]
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,146 @@
+import collections
+import os
+import signal
+import time
+import types
+import typing as t
+
+# Where loop time goes, by the innermost frame that matches. `None` matches every function of the module.
+STAGES = {
+    ("selectors.py", "select"): "idle",
+    ("server.py", "process_connection"): "accept",
+    ("server.py", "process_handshake"): "accept",
+    ("server.py", "finish_handshake"): "accept",
+    ("server.py", "resume_session"): "accept",
+    ("server.py", "accept_client"): "accept",
+    ("handshake.py", None): "accept",
+    ("server.py", "process_message"): "receive_message",
+    ("decoder.py", None): "receive_message",
+    ("buffer.py", None): "receive_message",
+    ("pkcs1.py", "verify"): "rsa.verify",
+    ("verification.py", None): "rsa.verify",
+    ("session.py", "verify"): "hmac.verify",
+    ("logger.py", None): "logging",
+    ("server.py", "broadcast_message"): "broadcast",
+    ("server.py", "send_direct"): "broadcast",
+    ("compression.py", None): "compression",
+    ("history.py", None): "history",
+    ("capture.py", None): "capture",
+    ("server.py", "send"): "send",
+    ("server.py", "write"): "send",
+    ("server.py", "write_through"): "send",
+    ("server.py", "flush_coalesced"): "send",
+    ("server.py", "process_writable"): "send",
+    ("outbound.py", None): "send",
+    ("timers.py", None): "timers",
+    ("server.py", "expire_handshakes"): "timers",
+    ("server.py", "process_bus"): "cluster",
+    ("cluster.py", None): "cluster",
+    ("admin.py", None): "admin",
+}
+
+
+def _stage(stack: t.List[t.Tuple[str, str]]) -> str:
+    for module, function in reversed(stack):
+        # Stacks carry qualified names, stages are looked up by the plain one.
+        name = function.rpartition(".")[2]
+
+        stage = STAGES.get((module, name)) or STAGES.get((module, None))
+        if stage is not None:
+            return stage
+
+    return "other"
+
+
+# Samples the main thread's stack on a wall clock timer (SIGALRM), from a signal handler running in the sampled
+# thread itself. A sampling thread would only get the GIL when the loop releases it, mostly around system calls,
+# and see little else. Idle time in `select` is sampled too, so the shares add up to all of the loop's time.
+class SamplingProfiler:
+    __slots__ = ("interval", "top", "path", "deadline", "stacks", "stages", "leaves")
+
+    def __init__(self, interval: float, top: int) -> None:
+        self.interval = interval
+        self.top = top
+
+        # Set while a profile is being taken.
+        self.path = None
+        self.deadline = None
+
+        self.stacks = collections.Counter()
+        self.stages = collections.Counter()
+        self.leaves = collections.Counter()
+
+    @staticmethod
+    def supported() -> bool:
+        return hasattr(signal, "setitimer")
+
+    @property
+    def running(self) -> bool:
+        return self.deadline is not None
+
+    def start(self, duration: float, path: str) -> bool:
+        # Main thread only. Returns False if a profile is already being taken.
+        if self.running:
+            return False
+
+        self.path = path
+        self.deadline = time.monotonic() + duration
+
+        self.stacks.clear()
+        self.stages.clear()
+        self.leaves.clear()
+
+        signal.signal(signal.SIGALRM, self._sample)
+        signal.setitimer(signal.ITIMER_REAL, self.interval, self.interval)
+
+        return True
+
+    def _sample(self, _signum: int, frame: t.Optional[types.FrameType]) -> None:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((os.path.basename(code.co_filename), getattr(code, "co_qualname", code.co_name)))
+            frame = frame.f_back
+
+        # Outermost first, as collapsed stacks are written. The module sets apart what shares a name.
+        stack.reverse()
+
+        if stack:
+            self.stacks[";".join(f"{module}:{function}" for module, function in stack)] += 1
+            self.stages[_stage(stack)] += 1
+            self.leaves[f"{stack[-1][0]}:{stack[-1][1]}"] += 1
+
+        if time.monotonic() >= self.deadline:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    def cancel(self) -> None:
+        # Stops sampling without writing anything.
+        if self.running:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, signal.SIG_DFL)
+            self.deadline = None
+
+    def finish(self) -> t.Optional[str]:
+        # Once the time is up: writes the collapsed stacks (`frame;frame;frame count` per line, for flamegraph
+        # tools) and returns a summary. None while still sampling, or when there's no profile.
+        if not self.running or time.monotonic() < self.deadline:
+            return None
+
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, signal.SIG_DFL)
+        self.deadline = None
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+        total = sum(self.stages.values()) or 1
+
+        by_stage = ", ".join(f"{stage} {count / total:.1%}" for stage, count in self.stages.most_common())
+        by_function = ", ".join(f"{leaf} {count / total:.1%}" for leaf, count in self.leaves.most_common(self.top))
+
+        return (
+            f"Profile of {sum(self.stages.values())} samples written to {self.path}. By stage: {by_stage}. "
+            f"Top functions: {by_function}."
+        )
@@ -14,13 +14,17 @@ def on_startup(
     motd: t.Optional[str] = None
 ) -> None:
     # Imports To prevent circular imports.
-    from ..config import BANNER
+    from ..config import BANNER, HEADLESS
+
+    # Nothing to look at without a terminal.
+    if HEADLESS:
+        return
 
     # Variables
     spaces_4 = "    "
 
     # Generate initial message and add sections
-    message = dedent(f"""{BANNER}
+    message = dedent(f"""{get_bright_color("CYAN")}{BANNER}
     {get_bright_color("GREEN")}ZeroCOM {name} Running. | {get_bright_color("YELLOW")}v{VERSION}
     """)
 
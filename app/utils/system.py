@@ -0,0 +1,19 @@
+import os
+
+
+def raise_file_limit() -> int:
+    # Every connection holds a file descriptor, lift the soft limit up to the hard one.
+    if os.name != "posix":
+        return -1
+
+    import resource
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard != resource.RLIM_INFINITY and soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            soft = hard
+        except (ValueError, OSError):
+            pass
+
+    return soft
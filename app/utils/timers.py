@@ -0,0 +1,90 @@
+import math
+import time
+import typing as t
+
+
+class Timer:
+    __slots__ = ("tick", "callback", "args", "cancelled")
+
+    def __init__(self, tick: int, callback: t.Callable, args: tuple) -> None:
+        self.tick = tick
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        # Cancelled timers are skipped when their bucket comes round, no search needed.
+        self.cancelled = True
+
+
+# Hashed timer wheel: timers hash into `slots` buckets by their expiry tick, so scheduling and cancelling are O(1)
+# and each tick only looks at one bucket. Timers further out than a full turn stay put until their round comes.
+class TimerWheel:
+    __slots__ = ("resolution", "_buckets", "_tick", "_count")
+
+    def __init__(self, resolution: float = 1.0, slots: int = 512) -> None:
+        self.resolution = resolution
+        self._buckets = [[] for _ in range(slots)]
+
+        # Last tick processed, and the number of timers scheduled (cancelled ones included until dropped).
+        self._tick = self._current_tick()
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _current_tick(self, now: t.Optional[float] = None) -> int:
+        return int((time.monotonic() if now is None else now) / self.resolution)
+
+    def schedule(self, delay: float, callback: t.Callable, *args: t.Any) -> Timer:
+        # Rounded up, a timer never fires early.
+        tick = max(self._current_tick() + math.ceil(delay / self.resolution), self._tick + 1)
+
+        timer = Timer(tick, callback, args)
+        self._buckets[tick % len(self._buckets)].append(timer)
+        self._count += 1
+
+        return timer
+
+    def timeout(self) -> t.Optional[float]:
+        # Seconds until the next tick is due, None when there is nothing to wait for.
+        if not self._count:
+            return None
+
+        return max((self._tick + 1) * self.resolution - time.monotonic(), 0)
+
+    def advance(self) -> int:
+        # Fires every timer due by now, returns how many fired.
+        target = self._current_tick()
+        if target <= self._tick:
+            return 0
+
+        # After a long sleep one turn of the wheel covers every bucket.
+        steps = min(target - self._tick, len(self._buckets))
+        due = []
+
+        for step in range(1, steps + 1):
+            index = (self._tick + step) % len(self._buckets)
+            bucket = self._buckets[index]
+            if not bucket:
+                continue
+
+            pending = []
+            for timer in bucket:
+                if timer.cancelled:
+                    self._count -= 1
+                elif timer.tick <= target:
+                    due.append(timer)
+                else:
+                    pending.append(timer)
+
+            self._buckets[index] = pending
+
+        # Callbacks may schedule new timers, those land after the current tick.
+        self._tick = target
+        self._count -= len(due)
+
+        for timer in due:
+            timer.callback(*timer.args)
+
+        return len(due)
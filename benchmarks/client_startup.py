@@ -0,0 +1,42 @@
+import statistics
+import sys
+import tempfile
+import time
+
+from app.encryption.keystore import KeyStore
+from app.models.client import Client
+
+# Client construction time with an empty keystore (key generated and stored) against a populated one.
+# Usage: python -m benchmarks.client_startup [CLIENTS]
+
+
+def measure(keystore: KeyStore, usernames: list) -> list:
+    durations = []
+
+    for username in usernames:
+        start = time.perf_counter()
+        client = Client(("127.0.0.1", 0), username, keystore=keystore)
+        durations.append((time.perf_counter() - start) * 1000)
+
+        client.socket.close()
+
+    return durations
+
+
+def report(name: str, durations: list) -> None:
+    print(
+        f"{name:<5} total {sum(durations):9.2f}ms | mean {statistics.mean(durations):7.2f}ms | "
+        f"median {statistics.median(durations):7.2f}ms | max {max(durations):7.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    usernames = [f"bot-{index}" for index in range(clients)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        keystore = KeyStore(directory)
+
+        print(f"Starting {clients} clients.")
+        report("cold", measure(keystore, usernames))
+        report("warm", measure(keystore, usernames))
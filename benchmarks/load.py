@@ -0,0 +1,302 @@
+import argparse
+import configparser
+import os
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from app.config import FRAMING, IP, PORT
+from app.constants import CONFIG_FILE
+from app.encryption.keystore import KeyStore
+from app.models.client import Client, ConnectionClosedError
+from app.protocol import OutboundQueue
+
+# Drives headless clients from a single process against a running server, every client in the default
+# channel, and reports relayed messages/sec, fan-out bytes/sec and end-to-end latency percentiles.
+# Usage: python -m benchmarks.load [--clients N] [--rate MSGS] [--duration SECONDS] [--spawn-server]
+
+# Prefix of benchmark messages: "<MARKER> <run> <client> <sequence> <perf_counter_ns> <padding>". Messages of
+# other runs, replayed from a server's history, are told apart by the run.
+MARKER = "load"
+
+# Where `app` is imported from, for servers started in a scratch directory.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Bytes a bot may have queued towards the server before its messages are counted as dropped.
+SEND_HIGH_WATERMARK = 64 * 1024 * 1024
+
+
+class Bot:
+    __slots__ = ("index", "client", "outbound")
+
+    def __init__(self, index: int, client: Client) -> None:
+        self.index = index
+        self.client = client
+        self.outbound = OutboundQueue(SEND_HIGH_WATERMARK, SEND_HIGH_WATERMARK // 2)
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load")
+
+    parser.add_argument("--host", default=IP)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--clients", type=int, default=20, help="Headless clients to connect.")
+    parser.add_argument("--rate", type=float, default=10, help="Messages per second sent by each client.")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to keep sending.")
+    parser.add_argument("--size", type=int, default=64, help="Message size in bytes.")
+    parser.add_argument("--framing", choices=("binary", "legacy"), default=FRAMING)
+    parser.add_argument("--spawn-server", action="store_true", help="Start `app.server` for the run.")
+
+    return parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_server(address: tuple, directory: str, wait: bool = True) -> subprocess.Popen:
+    # Started in a scratch directory with its own history, so earlier runs aren't replayed to joining clients.
+    # Relative paths of the config (keys, logs, profiles) end up there as well. It listens where it's asked to,
+    # and serves metrics on a port of its own, so it doesn't clash with a server already running. Returns once
+    # it accepts connections, or right away without `wait`.
+    try:
+        socket.create_connection(address, timeout=1).close()
+    except OSError:
+        pass
+    else:
+        raise SystemExit(f"Something is already listening on {address[0]}:{address[1]}.")
+
+    config = configparser.ConfigParser()
+    config.read(os.path.join(ROOT, CONFIG_FILE))
+    config.set("history", "DIRECTORY", os.path.join(directory, "history"))
+
+    config.set("server", "IP", address[0])
+    config.set("server", "PORT", str(address[1]))
+    if config.get("admin", "PORT"):
+        config.set("admin", "PORT", str(free_port()))
+
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, CONFIG_FILE), "w") as file:
+        config.write(file)
+
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (ROOT, os.environ.get("PYTHONPATH")))))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.server"], cwd=directory, env=environment, stdout=subprocess.DEVNULL
+    )
+
+    if not wait:
+        return server
+
+    # Ready once it accepts connections.
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(address, timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+
+    server.kill()
+    raise SystemExit("The server did not start listening in time.")
+
+
+def start_bots(count: int, address: tuple, framing_mode: str, keystore: KeyStore) -> list:
+    bots = []
+
+    for index in range(count):
+        client = Client(address, f"load-{index}", framing_mode, keystore=keystore)
+        client.connect()
+        client.initialize(display_banner=False)
+
+        bots.append(Bot(index, client))
+
+    return bots
+
+
+def encode(bot: Bot, run_id: str, sequence: int, size: int) -> bytes:
+    message = f"{MARKER} {run_id} {bot.index} {sequence} {time.perf_counter_ns()} "
+    return bot.client.encode_message(message.ljust(size, "x"))
+
+
+def send(selector: selectors.BaseSelector, bot: Bot, data: bytes) -> None:
+    queue = bot.outbound
+    was_empty = not queue
+
+    queue.push(data)
+    if not was_empty:
+        return
+
+    queue.flush(bot.client.socket)
+    if queue:
+        selector.modify(bot.client.socket, selectors.EVENT_READ | selectors.EVENT_WRITE, bot)
+
+
+def drop(selector: selectors.BaseSelector, bot: Bot, connected: list, failed: set) -> None:
+    # Disconnected by the server, or the connection broke. It neither sends nor counts towards the fan-out anymore.
+    selector.unregister(bot.client.socket)
+    bot.client.disconnect()
+
+    connected.remove(bot)
+    failed.add(bot.index)
+
+
+def run(bots: list, rate: float, duration: float, size: int) -> dict:
+    selector = selectors.DefaultSelector()
+    for bot in bots:
+        selector.register(bot.client.socket, selectors.EVENT_READ, bot)
+
+    # Everyone shares the default channel, so each message fans out to every other client still connected.
+    connected = list(bots)
+    failed = set()
+    interval = 1 / (rate * len(bots))
+
+    run_id = os.urandom(4).hex()
+    prefix = f"{MARKER} {run_id} "
+
+    latencies = []
+    relayed = set()
+    sent = 0
+    expected = 0
+
+    start = time.perf_counter()
+    send_until = start + duration
+    next_send = start
+    last_delivery = start
+
+    while True:
+        now = time.perf_counter()
+
+        if now < send_until:
+            # When the sender can't keep up, skip ahead instead of bursting to catch up.
+            if next_send < now - 1:
+                next_send = now
+
+            while next_send <= now and connected:
+                bot = connected[sent % len(connected)]
+
+                try:
+                    send(selector, bot, encode(bot, run_id, sent, size))
+                except OSError:
+                    drop(selector, bot, connected, failed)
+                    continue
+
+                sent += 1
+                expected += len(connected) - 1
+                next_send += interval
+
+            timeout = max(next_send - time.perf_counter(), 0)
+        else:
+            # Drain whatever is still in flight, giving up after a quiet second.
+            if len(latencies) >= expected or now - max(last_delivery, send_until) > 1:
+                break
+
+            timeout = 0.05
+
+        for key, mask in selector.select(timeout):
+            bot = key.data
+
+            # Dropped earlier in this iteration.
+            if bot.index in failed:
+                continue
+
+            try:
+                if mask & selectors.EVENT_WRITE:
+                    bot.outbound.flush(bot.client.socket)
+                    if not bot.outbound:
+                        selector.modify(bot.client.socket, selectors.EVENT_READ, bot)
+
+                if not mask & selectors.EVENT_READ:
+                    continue
+
+                messages = list(bot.client.receive_messages())
+            except (BlockingIOError, InterruptedError):
+                continue
+            except (ConnectionClosedError, OSError):
+                drop(selector, bot, connected, failed)
+                continue
+
+            received_at = time.perf_counter_ns()
+
+            for _username, message in messages:
+                if not message.startswith(prefix):
+                    continue
+
+                _, _run_id, _index, sequence, sent_at, _ = message.split(" ", 5)
+
+                latencies.append(received_at - int(sent_at))
+                relayed.add(int(sequence))
+
+            last_delivery = time.perf_counter()
+
+    elapsed = last_delivery - start
+    selector.close()
+
+    return {
+        "sent": sent,
+        "relayed": len(relayed),
+        "deliveries": len(latencies),
+        "expected": expected,
+        "failed": len(failed),
+        "dropped": sum(bot.outbound.dropped for bot in bots),
+        "bytes": sum(bot.client.received_bytes for bot in bots),
+        "elapsed": elapsed,
+        "latencies": sorted(latencies),
+    }
+
+
+def percentile(samples: list, quantile: float) -> float:
+    if not samples:
+        return 0.0
+
+    return samples[min(int(quantile * len(samples)), len(samples) - 1)] / 1e6
+
+
+def report(results: dict) -> None:
+    elapsed = results["elapsed"] or 1
+    latencies = results["latencies"]
+
+    print(
+        f"sent {results['sent']} | relayed {results['relayed']} | "
+        f"delivered {results['deliveries']}/{results['expected']} | send drops {results['dropped']} | "
+        f"failed clients {results['failed']}"
+    )
+    print(
+        f"server {results['relayed'] / elapsed:10.1f} msgs/sec | "
+        f"fan-out {results['deliveries'] / elapsed:10.1f} msgs/sec, {results['bytes'] / elapsed / 1024:10.1f} KiB/sec"
+    )
+    print(
+        f"latency p50 {percentile(latencies, 0.5):8.2f}ms | p99 {percentile(latencies, 0.99):8.2f}ms | "
+        f"p999 {percentile(latencies, 0.999):8.2f}ms | max {percentile(latencies, 1):8.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    server_address = (arguments.host, arguments.port)
+
+    with tempfile.TemporaryDirectory() as directory:
+        server_directory = os.path.join(directory, "server")
+        server_process = spawn_server(server_address, server_directory) if arguments.spawn_server else None
+
+        try:
+            print(f"Connecting {arguments.clients} clients to {arguments.host}:{arguments.port}.")
+            load_bots = start_bots(arguments.clients, server_address, arguments.framing, KeyStore(directory))
+
+            print(
+                f"Sending {arguments.rate:g} msgs/sec per client ({arguments.size} bytes) "
+                f"for {arguments.duration:g}s."
+            )
+            report(run(load_bots, arguments.rate, arguments.duration, arguments.size))
+
+            for load_bot in load_bots:
+                load_bot.client.disconnect()
+        finally:
+            if server_process is not None:
+                server_process.send_signal(signal.SIGINT)
+                server_process.wait(10)
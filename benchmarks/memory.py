@@ -0,0 +1,137 @@
+import argparse
+import signal
+import socket
+import tempfile
+import time
+
+from app.config import COMPRESSION, IP, KEY_SIZE, PORT, SESSION_MAC
+from app.encryption.rsa import RSA
+from app.protocol import framing
+from app.protocol.framing import FrameType
+from app.utils import raise_file_limit
+from .load import spawn_server
+
+# Opens idle, fully admitted connections against a server and reports how much its resident memory grows per
+# connection, to size hosts. Needs Linux (/proc) to read the server's memory. Every connection uses the same key,
+# so no time is spent generating them. Both processes need a file limit above the largest count.
+# Usage: python -m benchmarks.memory [--connections 10000 100000] [--spawn-server | --pid PID]
+
+# Connections opened before the baseline is taken, so one-off allocations aren't counted per connection.
+WARMUP = 100
+
+# Connections handshaking at once.
+BATCH = 500
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.memory")
+
+    parser.add_argument("--host", default=IP)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument(
+        "--connections", type=int, nargs="+", default=[10_000, 100_000], help="Connection counts to report at."
+    )
+
+    server = parser.add_mutually_exclusive_group(required=True)
+    server.add_argument("--spawn-server", action="store_true", help="Start `app.server` for the run.")
+    server.add_argument("--pid", type=int, help="Process id of a server that is already running.")
+
+    return parser.parse_args()
+
+
+def resident_memory(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+
+    raise SystemExit(f"No memory information for process {pid}.")
+
+
+class Connector:
+    __slots__ = ("address", "public_key_pem", "capabilities", "sockets")
+
+    def __init__(self, address: tuple) -> None:
+        self.address = address
+
+        public_key, _ = RSA.generate_keys(KEY_SIZE)
+        self.public_key_pem = RSA.export_key_pkcs1(public_key, "PEM")
+
+        # Same features a regular client asks for, so the server keeps the same state per connection. Except for
+        # heartbeats: pings are never read here, and a long run would have the server drop the connections as idle
+        # halfway through. Without them the server keeps no idle timer per connection, TCP keepalive is used instead.
+        self.capabilities = framing.enabled_capabilities(SESSION_MAC, COMPRESSION, heartbeat=False, resume=True)
+        self.sockets = []
+
+    def open(self, count: int) -> None:
+        while len(self.sockets) < count:
+            batch = []
+
+            for _ in range(min(BATCH, count - len(self.sockets))):
+                index = len(self.sockets) + len(batch)
+                sock = socket.create_connection(self.address)
+
+                preamble = framing.encode_preamble(framing.PROTOCOL_VERSION, self.capabilities)
+                hello = framing.pack_hello(f"memory-{index}".encode(), self.public_key_pem)
+
+                sock.sendall(preamble + framing.encode_frame(FrameType.HELLO, 0, *hello))
+                batch.append(sock)
+
+            # Admitted once the WELCOME frame arrives, whatever follows it is left unread.
+            for sock in batch:
+                framing.recv_exact(sock, framing.PREAMBLE.size)
+
+                frame = framing.recv_frame(sock)
+                while frame and frame.type != FrameType.WELCOME:
+                    frame = framing.recv_frame(sock)
+
+                if frame is None:
+                    raise SystemExit(f"Connection {len(self.sockets)} was refused.")
+
+                self.sockets.append(sock)
+
+    def close(self) -> None:
+        for sock in self.sockets:
+            sock.close()
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    server_address = (arguments.host, arguments.port)
+
+    limit = raise_file_limit()
+    if limit != -1 and limit < max(arguments.connections) + WARMUP:
+        print(f"Warning: the file limit of {limit} is below the largest connection count.")
+
+    with tempfile.TemporaryDirectory() as directory:
+        server_process = spawn_server(server_address, directory) if arguments.spawn_server else None
+        pid = server_process.pid if server_process is not None else arguments.pid
+
+        connector = Connector(server_address)
+
+        try:
+            connector.open(WARMUP)
+            time.sleep(0.5)
+            baseline = resident_memory(pid)
+
+            print(f"Baseline with {WARMUP} connections: {baseline / 1024 / 1024:.1f} MiB.")
+
+            for target in sorted(arguments.connections):
+                start = time.perf_counter()
+                connector.open(target + WARMUP)
+                opened = time.perf_counter() - start
+
+                # Let the server finish whatever follows admission (history replay, log writes).
+                time.sleep(0.5)
+
+                grown = resident_memory(pid) - baseline
+                print(
+                    f"{target:>8} idle connections | {grown / 1024 / 1024:9.1f} MiB | "
+                    f"{grown / target:9.0f} bytes/connection | opened in {opened:6.1f}s"
+                )
+        finally:
+            connector.close()
+
+            if server_process is not None:
+                server_process.send_signal(signal.SIGINT)
+                server_process.wait(30)
@@ -0,0 +1,314 @@
+import argparse
+import collections
+import os
+import selectors
+import signal
+import tempfile
+import time
+import typing as t
+
+from app.config import IP, PORT
+from app.encryption.keystore import KeyStore
+from app.models.capture import CaptureEvent, read_capture
+from app.models.client import Client, ConnectionClosedError, HandshakeError
+from app.protocol import OutboundQueue, ProtocolError
+from .load import SEND_HIGH_WATERMARK, percentile, spawn_server
+
+# Plays a capture recorded by a server (`[capture]` in `config.ini`) back against a server, at the recorded
+# pace, N times faster or as fast as possible, and reports throughput and delivery latency. Every connection
+# is replayed by a client of the same name and framing, messages are signed again with the client's own key
+# or session. A run against a freshly started server (`--spawn-server`) sends the same input every time, so
+# runs can be compared across changes.
+# Usage: python -m benchmarks.replay CAPTURE [--speed N | --fast] [--spawn-server]
+
+# Seconds without a delivery after the last record before the run is considered over.
+DRAIN_TIMEOUT = 1
+
+# Seconds a connection stays open after its CLOSE, to read what the server was still relaying to it.
+LINGER = 1
+
+
+class Connection:
+    __slots__ = ("client", "outbound", "joined", "left")
+
+    def __init__(self, client: Client) -> None:
+        self.client = client
+        self.outbound = OutboundQueue(SEND_HIGH_WATERMARK, SEND_HIGH_WATERMARK // 2)
+
+        # Only messages sent in between are deliveries, anything before is a history replay.
+        self.joined = time.perf_counter_ns()
+        self.left = None
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.replay")
+
+    parser.add_argument("capture", help="Capture file to replay.")
+    parser.add_argument("--host", default=IP)
+    parser.add_argument("--port", type=int, default=PORT)
+
+    pace = parser.add_mutually_exclusive_group()
+    pace.add_argument("--speed", type=float, default=1, help="Replay N times faster than recorded.")
+    pace.add_argument("--fast", action="store_true", help="Replay as fast as possible.")
+
+    parser.add_argument("--spawn-server", action="store_true", help="Start `app.server` for the run.")
+
+    return parser.parse_args()
+
+
+def prepare_clients(records: list, address: tuple, keystore: KeyStore) -> dict:
+    # Keys are made up front, so generating them doesn't count towards the replay.
+    clients = {}
+
+    for _elapsed, _connection, event, payload in records:
+        if event == CaptureEvent.CONNECT:
+            username = payload[1:].decode()
+            framing_mode = "binary" if payload[0] else "legacy"
+
+            if username not in clients:
+                clients[username] = Client(address, username, framing_mode, keystore=keystore)
+
+    return clients
+
+
+class Replay:
+    __slots__ = (
+        "clients",
+        "selector",
+        "connections",
+        "leaving",
+        "pending",
+        "last_sent",
+        "latencies",
+        "sent",
+        "delivered",
+        "refused",
+        "lost",
+    )
+
+    def __init__(self, clients: dict) -> None:
+        self.clients = clients
+        self.selector = selectors.DefaultSelector()
+
+        # Capture connection -> replaying connection. Closed ones linger in `leaving`, oldest first.
+        self.connections = {}
+        self.leaving = collections.deque()
+
+        # (sender, message) -> send times of messages not seen by anyone yet, and when it was last sent.
+        self.pending = collections.defaultdict(collections.deque)
+        self.last_sent = {}
+
+        self.latencies = []
+        self.sent = 0
+        self.delivered = 0
+        self.refused = 0
+        self.lost = 0
+
+    def connect(self, connection_id: int, payload: bytes) -> None:
+        client = self.clients[payload[1:].decode()]
+
+        # Reconnecting with a name that is still lingering.
+        for connection in [connection for connection in self.leaving if connection.client is client]:
+            self.leaving.remove(connection)
+            self.close(connection)
+
+        client.framing_mode = "binary" if payload[0] else "legacy"
+        client.reset()
+
+        try:
+            client.socket.connect((client.host, client.port))
+            client.handshake()
+        except (OSError, HandshakeError, ProtocolError):
+            client.disconnect()
+            self.refused += 1
+            return
+
+        connection = Connection(client)
+        self.connections[connection_id] = connection
+        self.selector.register(client.socket, selectors.EVENT_READ, connection)
+
+    def leave(self, connection_id: int) -> None:
+        connection = self.connections.pop(connection_id, None)
+        if connection is None:
+            return
+
+        # Frames already on their way to it are still read and counted, however fast the replay.
+        connection.left = time.perf_counter_ns()
+        self.leaving.append(connection)
+
+    def close_lingering(self, linger: float) -> None:
+        cutoff = time.perf_counter_ns() - int(linger * 1e9)
+
+        while self.leaving and self.leaving[0].left <= cutoff:
+            self.close(self.leaving.popleft())
+
+    def close(self, connection: Connection) -> None:
+        self.selector.unregister(connection.client.socket)
+        connection.client.disconnect()
+
+    def send(self, connection_id: int, payload: bytes) -> None:
+        connection = self.connections.get(connection_id)
+        if connection is None:
+            return
+
+        client = connection.client
+        message = payload.decode("utf-8", "replace").replace("\n", "")
+
+        queue = connection.outbound
+        was_empty = not queue
+
+        queue.push(client.encode_message(message))
+
+        sent_at = time.perf_counter_ns()
+        self.pending[(client.username, message)].append(sent_at)
+        self.last_sent[(client.username, message)] = sent_at
+        self.sent += 1
+
+        if not was_empty:
+            return
+
+        queue.flush(client.socket)
+        if queue:
+            self.selector.modify(client.socket, selectors.EVENT_READ | selectors.EVENT_WRITE, connection)
+
+    def poll(self, timeout: float) -> bool:
+        # Returns whether anything was delivered.
+        delivered = False
+
+        for key, mask in self.selector.select(timeout):
+            connection = key.data
+            client = connection.client
+
+            try:
+                if mask & selectors.EVENT_WRITE:
+                    connection.outbound.flush(client.socket)
+                    if not connection.outbound:
+                        self.selector.modify(client.socket, selectors.EVENT_READ, connection)
+
+                if not mask & selectors.EVENT_READ:
+                    continue
+
+                messages = list(client.receive_messages())
+            except (BlockingIOError, InterruptedError):
+                continue
+            except (ConnectionClosedError, OSError, ProtocolError):
+                # Dropped by the server, the capture's CLOSE for it is ignored.
+                self.close(connection)
+
+                if connection.left is not None:
+                    self.leaving.remove(connection)
+                else:
+                    self.connections = {
+                        index: other for index, other in self.connections.items() if other is not connection
+                    }
+                    self.lost += 1
+
+                continue
+
+            received_at = time.perf_counter_ns()
+
+            for username, message in messages:
+                key = (username.replace(" (private)", ""), message)
+
+                # Only chat this replay sent while the recipient was connected, not server notices or history.
+                last_sent = self.last_sent.get(key)
+                if last_sent is None or last_sent < connection.joined:
+                    continue
+
+                if connection.left is not None and last_sent > connection.left:
+                    continue
+
+                self.delivered += 1
+                delivered = True
+
+                # Latency is counted to the first recipient, private messages included.
+                sent_at = self.pending.get(key)
+                if sent_at:
+                    self.latencies.append(received_at - sent_at.popleft())
+
+        return delivered
+
+    def run(self, records: list, speed: t.Optional[float]) -> float:
+        start = time.perf_counter()
+
+        for elapsed, connection_id, event, payload in records:
+            # Keeps reading while waiting for the record's turn, as fast replays don't wait at all.
+            if speed is not None:
+                due = start + elapsed / speed
+
+                while time.perf_counter() < due:
+                    self.poll(due - time.perf_counter())
+            else:
+                self.poll(0)
+
+            self.close_lingering(LINGER)
+
+            if event == CaptureEvent.CONNECT:
+                self.connect(connection_id, payload)
+            elif event == CaptureEvent.MESSAGE:
+                self.send(connection_id, payload)
+            elif event == CaptureEvent.CLOSE:
+                self.leave(connection_id)
+
+        # Drain what is still in flight.
+        last_delivery = time.perf_counter()
+        while time.perf_counter() - last_delivery < DRAIN_TIMEOUT:
+            if self.poll(0.05):
+                last_delivery = time.perf_counter()
+
+        self.close_lingering(0)
+
+        for connection in self.connections.values():
+            self.close(connection)
+
+        self.connections.clear()
+
+        self.selector.close()
+        return last_delivery - start
+
+
+def report(records: list, replay: Replay, elapsed: float) -> None:
+    recorded = records[-1][0] if records else 0
+    connections = sum(1 for record in records if record[2] == CaptureEvent.CONNECT)
+    latencies = sorted(replay.latencies)
+    elapsed = elapsed or 1
+
+    print(
+        f"records {len(records)} | recorded over {recorded:.1f}s, replayed in {elapsed:.1f}s | connections "
+        f"{connections - replay.refused}/{connections} (lost {replay.lost})"
+    )
+    print(
+        f"sent {replay.sent} | {replay.sent / elapsed:10.1f} msgs/sec | delivered {replay.delivered} | "
+        f"{replay.delivered / elapsed:10.1f} deliveries/sec"
+    )
+    print(
+        f"latency to first recipient p50 {percentile(latencies, 0.5):8.2f}ms | "
+        f"p99 {percentile(latencies, 0.99):8.2f}ms | p999 {percentile(latencies, 0.999):8.2f}ms | "
+        f"max {percentile(latencies, 1):8.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    server_address = (arguments.host, arguments.port)
+
+    # Read in full first, a spawned server with capturing enabled starts a file of its own.
+    capture = list(read_capture(arguments.capture))
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"Preparing keys for {arguments.capture}.")
+        replay_clients = prepare_clients(capture, server_address, KeyStore(directory))
+
+        server_directory = os.path.join(directory, "server")
+        server_process = spawn_server(server_address, server_directory) if arguments.spawn_server else None
+
+        try:
+            pace = "as fast as possible" if arguments.fast else f"at {arguments.speed:g}x"
+            print(f"Replaying {len(capture)} records {pace}.")
+
+            capture_replay = Replay(replay_clients)
+            report(capture, capture_replay, capture_replay.run(capture, None if arguments.fast else arguments.speed))
+        finally:
+            if server_process is not None:
+                server_process.send_signal(signal.SIGINT)
+                server_process.wait(10)
@@ -0,0 +1,105 @@
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from app.config import HEADLESS, IP, PORT
+from app.encryption.keystore import KeyStore
+from app.models.client import Client, HandshakeError
+from .load import spawn_server
+
+# Import time of the server and client entry points in fresh interpreters, and the time from spawning
+# `app.server` until a client completes its handshake. The spawned server writes to a pipe, so it runs
+# headless unless `HEADLESS=no` is set in `config.ini`.
+# Usage: python -m benchmarks.startup [--runs N]
+
+IMPORT_PROBE = (
+    "import sys, time\n"
+    "start = time.perf_counter()\n"
+    "import {module}\n"
+    "print((time.perf_counter() - start) * 1000, 'rich' in sys.modules, 'colorama' in sys.modules)\n"
+)
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup")
+
+    parser.add_argument("--runs", type=int, default=5, help="Repetitions per measurement.")
+    parser.add_argument("--host", default=IP)
+    parser.add_argument("--port", type=int, default=PORT)
+
+    return parser.parse_args()
+
+
+def measure_import(module: str, runs: int) -> tuple:
+    durations = []
+
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE.format(module=module)], capture_output=True, text=True, check=True
+        ).stdout.split()
+
+        durations.append(float(output[0]))
+
+    return durations, output[1] == "True", output[2] == "True"
+
+
+def measure_first_accept(address: tuple, keystore: KeyStore, directory: str) -> float:
+    # Waited for here rather than in `spawn_server`, which only polls every 100ms.
+    start = time.perf_counter()
+    server = spawn_server(address, directory, wait=False)
+
+    try:
+        deadline = start + 30
+
+        # Keep trying until the server is listening and lets a client all the way in.
+        while time.perf_counter() < deadline:
+            client = Client(address, "startup", keystore=keystore)
+
+            try:
+                client.socket.connect(address)
+                client.handshake()
+            except (OSError, HandshakeError):
+                time.sleep(0.005)
+                continue
+            finally:
+                client.disconnect()
+
+            return (time.perf_counter() - start) * 1000
+
+        raise SystemExit("The server did not accept a connection in time.")
+    finally:
+        server.send_signal(signal.SIGINT)
+        server.wait(10)
+
+
+def report(name: str, durations: list, extra: str = "") -> None:
+    print(
+        f"{name:<22} median {statistics.median(durations):8.2f}ms | min {min(durations):8.2f}ms | "
+        f"max {max(durations):8.2f}ms{extra}"
+    )
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    print(f"Headless here: {HEADLESS}. {arguments.runs} runs each.")
+
+    for module in ("app.models.server", "app.models.client"):
+        durations, rich_loaded, colorama_loaded = measure_import(module, arguments.runs)
+        report(f"import {module}", durations, f" | rich {rich_loaded} | colorama {colorama_loaded}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        keystore = KeyStore(directory)
+        server_address = (arguments.host, arguments.port)
+
+        report(
+            "first accepted client",
+            [
+                measure_first_accept(server_address, keystore, os.path.join(directory, f"server-{run}"))
+                for run in range(arguments.runs)
+            ],
+        )
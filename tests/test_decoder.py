@@ -0,0 +1,54 @@
+import socket
+import unittest
+
+from app.protocol import ProtocolError
+from app.protocol.buffer import ReadBuffer
+from app.protocol.decoder import LegacyDecoder
+
+HEADER_LENGTH = 10
+
+
+def fill(data: bytes) -> ReadBuffer:
+    buffer = ReadBuffer()
+    sender, receiver = socket.socketpair()
+
+    with sender, receiver:
+        sender.sendall(data)
+        while len(buffer) < len(data):
+            buffer.recv_into(receiver)
+
+    return buffer
+
+
+class LegacyDecoderTest(unittest.TestCase):
+    def test_pairs(self) -> None:
+        data = b"5         alice7         message"
+        pairs = [(first, bytes(second)) for first, second in LegacyDecoder(HEADER_LENGTH).pairs(fill(data))]
+
+        self.assertEqual(pairs, [(b"alice", b"message")])
+
+    def test_rejects_negative_length(self) -> None:
+        # Used to move the buffer back onto the same header, looping forever.
+        buffer = fill(b"-4096     x")
+
+        with self.assertRaises(ProtocolError):
+            list(LegacyDecoder(HEADER_LENGTH).pairs(buffer))
+
+    def test_rejects_signed_and_malformed_lengths(self) -> None:
+        for header in (b"+5        ", b"5_0       ", b"          ", b"five      "):
+            with self.subTest(header=header), self.assertRaises(ProtocolError):
+                list(LegacyDecoder(HEADER_LENGTH).pairs(fill(header + b"hello")))
+
+
+class ReadBufferTest(unittest.TestCase):
+    def test_consume_rejects_negative_size(self) -> None:
+        buffer = fill(b"hello")
+
+        with self.assertRaises(ValueError):
+            buffer.consume(-1)
+
+        self.assertEqual(bytes(buffer.peek()), b"hello")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+
+from app.protocol import ProtocolError, framing
+
+
+class NegotiateTest(unittest.TestCase):
+    def test_settles_on_the_lower_version(self) -> None:
+        version, _ = framing.negotiate(framing.PROTOCOL_VERSION + 1, 0)
+        self.assertEqual(version, framing.PROTOCOL_VERSION)
+
+    def test_rejects_version_zero(self) -> None:
+        with self.assertRaises(ProtocolError):
+            framing.negotiate(0, 0)
+
+
+class NameLengthTest(unittest.TestCase):
+    def test_longest_name_round_trips(self) -> None:
+        username = b"x" * framing.MAX_NAME_LENGTH
+        payload = b"".join(framing.pack_relayed(username, b"body"))
+
+        self.assertEqual(framing.unpack_relayed(payload), (username, b"body"))
+
+    def test_rejects_longer_names(self) -> None:
+        username = b"x" * (framing.MAX_NAME_LENGTH + 1)
+
+        for pack in (framing.pack_relayed_prefix, lambda name: framing.pack_hello(name, b"key")):
+            with self.assertRaises(ProtocolError):
+                pack(username)
+
+
+if __name__ == "__main__":
+    unittest.main()
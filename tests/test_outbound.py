@@ -0,0 +1,125 @@
+import unittest
+
+from app.protocol import OutboundQueue, SlowConsumerError, SlowConsumerPolicy
+
+
+class FakeSocket:
+    # Takes at most `capacity` bytes until `drain` is called, like a socket with a full send buffer.
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.received = bytearray()
+
+    def sendmsg(self, buffers: list) -> int:
+        if not self.capacity:
+            raise BlockingIOError
+
+        data = b"".join(bytes(buffer) for buffer in buffers)[:self.capacity]
+        self.capacity -= len(data)
+        self.received += data
+
+        return len(data)
+
+    def drain(self, capacity: int = 1 << 20) -> None:
+        self.capacity = capacity
+
+
+class PartialWriteTest(unittest.TestCase):
+    def test_flush_resumes_mid_frame(self) -> None:
+        queue = OutboundQueue(1024, 512)
+        sock = FakeSocket(5)
+
+        for frame in (b"first", b"second", b"third"):
+            queue.push(frame)
+
+        self.assertEqual(queue.flush(sock), 5)
+        self.assertEqual(queue.size, len(b"secondthird"))
+
+        sock.drain(3)
+        queue.flush(sock)
+        self.assertEqual(queue.size, len(b"ondthird"))
+
+        sock.drain()
+        queue.flush(sock)
+
+        self.assertFalse(queue)
+        self.assertEqual(queue.size, 0)
+        self.assertEqual(bytes(sock.received), b"firstsecondthird")
+
+    def test_write_queues_what_the_socket_did_not_take(self) -> None:
+        queue = OutboundQueue(1024, 512)
+        sock = FakeSocket(4)
+
+        # The parts may be views into a buffer that is reused right after.
+        buffer = bytearray(b"headerbody")
+        self.assertEqual(queue.write(sock, (memoryview(buffer)[:6], memoryview(buffer)[6:])), 4)
+        buffer[:] = b"xxxxxxxxxx"
+
+        sock.drain()
+        queue.flush(sock)
+
+        self.assertEqual(bytes(sock.received), b"headerbody")
+        self.assertEqual(queue.size, 0)
+
+    def test_write_to_a_full_socket_queues_everything(self) -> None:
+        queue = OutboundQueue(1024, 512)
+        sock = FakeSocket(0)
+
+        self.assertEqual(queue.write(sock, (b"frame",)), 0)
+        self.assertEqual(queue.size, 5)
+
+
+class WatermarkTest(unittest.TestCase):
+    def test_first_frame_is_always_queued(self) -> None:
+        queue = OutboundQueue(4, 2)
+
+        self.assertTrue(queue.push(b"larger than the watermark"))
+
+    def test_drop_pauses_until_the_low_watermark(self) -> None:
+        queue = OutboundQueue(10, 4)
+        sock = FakeSocket(0)
+
+        self.assertTrue(queue.push(b"123456"))
+        self.assertFalse(queue.push(b"78901"))
+        self.assertTrue(queue.paused)
+
+        # Paused: even a frame that would fit is dropped.
+        self.assertFalse(queue.push(b"1"))
+        self.assertEqual(queue.dropped, 2)
+
+        sock.drain(1)
+        queue.flush(sock)
+        self.assertTrue(queue.paused)
+
+        sock.drain(1)
+        queue.flush(sock)
+        self.assertFalse(queue.paused)
+        self.assertTrue(queue.push(b"1"))
+
+    def test_disconnect_raises(self) -> None:
+        queue = OutboundQueue(10, 4, SlowConsumerPolicy.DISCONNECT)
+        queue.push(b"123456")
+
+        with self.assertRaises(SlowConsumerError):
+            queue.push(b"78901")
+
+    def test_coalesce_keeps_the_partly_written_head(self) -> None:
+        queue = OutboundQueue(12, 10, SlowConsumerPolicy.COALESCE)
+        sock = FakeSocket(2)
+
+        for frame in (b"aaaa", b"bbbb", b"cccc"):
+            queue.push(frame)
+
+        queue.flush(sock)
+        self.assertTrue(queue.push(b"dddd"))
+        self.assertEqual(queue.dropped, 1)
+
+        sock.drain()
+        queue.flush(sock)
+
+        # The oldest whole frame went, the head was already on the wire and is finished.
+        self.assertEqual(bytes(sock.received), b"aaaaccccdddd")
+        self.assertEqual(queue.size, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()